@@ -0,0 +1,144 @@
+import hashlib
+import json
+from flask import Blueprint, Response, request, stream_with_context, jsonify, abort
+from sqlalchemy import select
+from start import db
+from models import Venue, Artist, Show
+from queries import getVenueDetail, getArtistDetail, listingValidatorsQuery, showListingValidatorsQuery, \
+    venueValidatorsQuery, artistValidatorsQuery
+from cache import pageCache
+from replicas import replicaRead
+
+api = Blueprint('api', __name__)
+
+# rows fetched from the server-side cursor at a time while streaming a collection
+YIELD_PER = 1000
+
+VENUE_COLUMNS = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone, Venue.image_link,
+    Venue.facebook_link, Venue.genres, Venue.website, Venue.seeking_talent, Venue.seeking_description)
+ARTIST_COLUMNS = (Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.genres, Artist.image_link,
+    Artist.facebook_link, Artist.website, Artist.seeking_venue, Artist.seeking_description)
+
+# what each collection holds, and the query of its validators (see queries.py)
+COLLECTIONS = {
+    'venues': {
+        'model': Venue,
+        'validators': lambda: listingValidatorsQuery(Venue),
+        'query': lambda: select(*VENUE_COLUMNS).order_by(Venue.id)
+    },
+    'artists': {
+        'model': Artist,
+        'validators': lambda: listingValidatorsQuery(Artist),
+        'query': lambda: select(*ARTIST_COLUMNS).order_by(Artist.id)
+    },
+    'shows': {
+        'model': Show,
+        'validators': showListingValidatorsQuery,
+        'query': lambda: select(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link')
+        ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).order_by(Show.id)
+    }
+}
+
+# make values JSON can hold (start times become ISO 8601 strings)
+def toJson(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: toJson(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [toJson(item) for item in value]
+    return value
+
+# a validator for a collection that costs one small aggregate query instead of reading the rows: the latest
+# updated_at of the rows it is made from and their number, which every insert, edit and delete changes
+def collectionETag(collection):
+    validators = tuple(db.session.execute(collection['validators']()).one())
+    return hashlib.sha1(repr((collection['model'].__tablename__, validators)).encode()).hexdigest()
+
+# answer with 304 when the client already has this version of the resource
+def notModified(etag):
+    if request.if_none_match.contains(etag):
+        return Response(status = 304, headers = {'ETag': '"%s"' % etag})
+    return None
+
+# stream every row of a collection as one JSON object per line (NDJSON); rows come from a server-side
+# cursor YIELD_PER at a time and are never collected, so memory stays the same whatever the size
+def streamCollection(name):
+    collection = COLLECTIONS[name]
+    etag = collectionETag(collection)
+    response = notModified(etag)
+    if response is not None:
+        db.session.close()
+        return response
+
+    def generate():
+        try:
+            rows = db.session.execute(collection['query']().execution_options(yield_per = YIELD_PER))
+            for row in rows:
+                yield json.dumps(toJson(row._asdict())) + '\n'
+        finally:
+            db.session.close()
+
+    return Response(stream_with_context(generate()), mimetype = 'application/x-ndjson', headers = {'ETag': '"%s"' % etag})
+
+# answer with one entity as JSON, tagged with a hash of its body
+def entityResponse(data):
+    if data is None:
+        abort(404)
+    body = json.dumps(toJson(data))
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    response = notModified(etag)
+    if response is not None:
+        return response
+    return Response(body, mimetype = 'application/json', headers = {'ETag': '"%s"' % etag})
+
+@api.route('/venues')
+@replicaRead
+def list_venues():
+    return streamCollection('venues')
+
+@api.route('/artists')
+@replicaRead
+def list_artists():
+    return streamCollection('artists')
+
+@api.route('/shows')
+@replicaRead
+def list_shows():
+    return streamCollection('shows')
+
+# the validators of an entity (the ones its HTML page is tagged with), which its cache key carries like the
+# pages' do: an edit made through any process, or a show of it moving to past, changes them, so the entry is
+# built again instead of being served stale; None for an entity that does not exist
+def entityValidators(query):
+    row = db.session.execute(query).first()
+    return None if row is None else tuple(row)
+
+@api.route('/venues/<int:venue_id>')
+@replicaRead
+def get_venue(venue_id):
+    try:
+        data = pageCache.fetch('venue', (venue_id, entityValidators(venueValidatorsQuery(venue_id))), lambda: getVenueDetail(venue_id))
+    finally:
+        db.session.close()
+    return entityResponse(data)
+
+@api.route('/artists/<int:artist_id>')
+@replicaRead
+def get_artist(artist_id):
+    try:
+        data = pageCache.fetch('artist', (artist_id, entityValidators(artistValidatorsQuery(artist_id))), lambda: getArtistDetail(artist_id))
+    finally:
+        db.session.close()
+    return entityResponse(data)
+
+@api.errorhandler(404)
+def not_found_error(error):
+    return jsonify({'error': 'not found'}), 404
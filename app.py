@@ -2,34 +2,61 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import babel
-from flask import render_template, request, Response, flash, redirect, url_for, abort
-import dateutil.parser
-from flask_sqlalchemy import SQLAlchemy
+from flask import render_template, request, Response, flash, redirect, url_for, abort, jsonify
 import logging
-from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 import collections
 import collections.abc
 import sys
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
 from werkzeug.datastructures import MultiDict
-import traceback
 from models import Venue, Artist, Show
+from queries import getVenueAreas, getArtistsPage, getShowsPage, getVenueDetail, getArtistDetail
+from queries import VENUE_KEY, ARTIST_KEY, SHOW_KEY
+from queries import listingValidatorsQuery, venueValidatorsQuery, artistValidatorsQuery
+from pagination import getPageArgs, pageKey
+from search import search, getLimit as getSearchLimit
+from api import api
+from importer import importCommand
+from dbpool import poolStats
+import instrumentation
+from instrumentation import queryBudget, routeStats
+import metrics
+import logs
+import replicas
+import counters
+from replicas import replicaRead
+import conditional
+from conditional import conditionalGet, pageTag
+from dates import formatDatetime, formatStartTimes
+from fragments import FragmentCacheExtension
+import assets
+from edits import saveEdit, formValues, rebaseForm, StaleEdit, VENUE_FIELDS, ARTIST_FIELDS
+from deletion import countVenueShows, deleteVenue, deleteVenueInBackground, venueDeleted
+from cache import pageCache, showsChanged
 from start import app, db
 # App Config.
 collections.Callable = collections.abc.Callable
 
-# Error handling
-app.logger.setLevel(logging.ERROR)
-errorHandler = RotatingFileHandler('error.log', maxBytes=10000, backupCount=1)
-app.logger.setLevel(logging.ERROR)
-app.logger.addHandler(errorHandler)
+# Error handling: JSON lines with the route, ids and latency of the request, written off the request thread
+logs.init(app)
+
+# count statements and time the database, templates and whole request of every route
+instrumentation.init(app)
+# {% cache key, ttl %} in templates, kept in the page cache
+app.jinja_env.add_extension(FragmentCacheExtension)
+# asset_url()/asset_urls() in templates and flask build-assets
+assets.init(app)
+# latency histograms, requests in flight and form failures for /metrics
+metrics.init(app)
+# the views marked @replicaRead read from the replicas of the config, if any
+replicas.init(app)
+# upcoming/past show counters of venues and artists: flask rebuild-counters/roll-counters
+counters.init(app)
+# ETag/Last-Modified, 304s and Cache-Control for the views marked @conditionalGet (after the replica is picked)
+conditional.init(app)
 
 class NoSuchId(Exception):
   pass
@@ -40,13 +67,8 @@ class InvalidData(Exception):
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+# formats datetimes without parsing them again, with precompiled Babel patterns and a memo of recent results
+format_datetime = formatDatetime
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -63,156 +85,66 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@queryBudget(2)
+@replicaRead
+@conditionalGet(lambda: listingValidatorsQuery(Venue))
 def venues():
-  # get info for all venues grouped by cities
-  def getCities(venues):
-    # make an empty array for cities with their venues
-    cityProfiles = []
-    # get a list of city and state tuples in which each city and state tuple is unique
-    cities = set((venue.city, venue.state) for venue in venues)
-    # attach a group of venues with their info to each city in the list
-    for city in cities:
-      # make an empty dictionary for the city that will include all the venues
-      info = {}
-      
-      # add name of the city
-      info['city'] = city[0]
-      
-      # add name of the state
-      info['state'] = city[1]
-      
-      # add all the venues with their info
-      # first get all the venues with the given city 
-      listOfVenues = list(filter(
-        lambda venue: (venue.city == info['city']),  
-        venues))
-      # make a list of info for every venue in the list of venues
-      info['venues'] = [({
-        'id': venue.id, 
-        'name': venue.name, 
-        'num_upcoming_shows': getNumberOfUpcomingShows(venue)
-        }) for venue in listOfVenues]
-      # add the whole info for the group of venues to the list of cities with their info
-      cityProfiles.append(info)
-    return cityProfiles
-
-  def getNumberOfUpcomingShows(venue):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    return db.session.query(Show).join(Venue.shows).filter(Venue.id == venue.id).filter(Show.start_time >= now).count()
-
-  # get and render info for all venues  
+  # get and render info for a page of venues
+  pageArgs = getPageArgs(len(VENUE_KEY))
   data = []
+  page = None
+  # the version of the page data, which its cached fragments are keyed on
+  version = None
   try:
-    # get info grouped by venues
-    data = getCities(Venue.query.all())
+    # get info grouped by cities, with the upcoming shows counted in the same query
+    page, version = pageCache.fetchVersioned('venues', pageKey(pageArgs) + (pageTag(),), lambda: getVenueAreas(pageArgs))
+    data = page.items
   except Exception:
-    print(sys.exc_info())
-    traceback.print_exc()
-    app.logger.error('Error retrieving list of venues from the database')
+    app.logger.exception('Error retrieving list of venues from the database')
   finally: db.session.close()
-  return render_template('pages/venues.html', areas=data);
+  return render_template('pages/venues.html', areas=data, page=page, version=version);
 
 @app.route('/venues/search', methods=['POST'])
+@queryBudget(3)
+@replicaRead
 def search_venues():
-  def getNumberOfUpcomingShows(venue):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    return db.session.query(Show).join(Venue.shows).filter(Venue.id == venue.id).filter(Show.start_time >= now).count()
-  
   # get venues
+  # first make an empty response to return even if there is an exception
+  response = {'count': 0, 'data': []}
   try:
     # get string to search for
     word = request.form.get('search_term')
-    # make the searth in the database
-    results = Venue.query.filter(Venue.name.ilike(f'%{word}%')).all()
-    # get needed info from the search results
-    response = {
-      'count': len(results),
-      'data': [
-        {
-        'id': result.id,
-        'name': result.name,
-        'num_upcoming_shows': getNumberOfUpcomingShows(result)
-        } for result in results
-      ]
-    }
-  except:
-    print(sys.exc_info()) 
-    app.logger.error('Error finding venues')
+    # make the search, ranked by how well the names match, with the upcoming shows counted in the same query
+    response = search(Venue, word, getSearchLimit(request.form))
+  except Exception:
+    app.logger.exception('Error finding venues')
   finally: db.session.close()
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@queryBudget(3)
+@replicaRead
+@conditionalGet(venueValidatorsQuery)
 def show_venue(venue_id):
-  def getInfo(venue):
-    shows = getShows(venue)
-    return {
-      'id': venue.id,
-      'name': venue.name,
-      'genres': [] if (venue.genres is None) else venue.genres,
-      'address': venue.address,
-      'city': venue.city,
-      'state': venue.state,
-      'phone': venue.phone,
-      'website': venue.website,
-      'facebook_link': venue.facebook_link,
-      'seeking_talent': venue.seeking_talent,
-      'seeking_description': venue.seeking_description,
-      'image_link': venue.image_link,
-      'upcoming_shows': [] if (venue.shows is None or shows['upcoming'] == 0) else shows['upcoming'],
-      'past_shows': [] if (venue.shows is None or shows['past'] == 0) else shows['past'],
-      'upcoming_shows_count': len(shows['upcoming']),
-      'past_shows_count': len(shows['past'])
-      }
-  
-  def getShows(venue):
-    return {
-      'upcoming': getUpcomingShows(venue),
-      'past': getPastShows(venue),
-    }
-
-  def getUpcomingShows(venue):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    results = db.session.query(Show).join(Venue.shows).filter(Venue.id == venue.id).filter(Show.start_time >= now).all()
-    print('number of results:', len(results))
-    print('results:')
-    print([result for result in results])
-    return [{
-      'artist_id': show.artist.id,
-      'artist_name': show.artist.name,
-      'artist_image_link': show.artist.image_link,
-      'start_time': show.start_time
-    } for show in results]
-
-  def getPastShows(venue):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    results = db.session.query(Show).join(Venue.shows).filter(Venue.id == venue.id).filter(Show.start_time < now).all()
-    return [{
-      'artist_id': show.artist.id,
-      'artist_name': show.artist.name,
-      'artist_image_link': show.artist.image_link,
-      'start_time': show.start_time
-    } for show in results]
-
   # get info
   # first make a list to return even if there is an exception
   data = []
+  version = None
   try:
-    # find the venue (it will actually be just one)
-    result = Venue.query.filter_by(id=venue_id).all()
+    # get the venue with all its shows and their artists, split into upcoming and past shows
+    data, version = pageCache.fetchVersioned('venue', (venue_id, pageTag()), lambda: getVenueDetail(venue_id))
     # report error if thera is no venue with the given id
-    if (len(result) == 0):
+    if data is None:
       raise NoSuchId
-    # get info if there is a venues with the given id
-    data = getInfo(result[0])
   except NoSuchId:
     app.logger.error('No such venue id')
     abort(404)
   except Exception:
-    app.logger.error('Error retrieving info about the venue from the database')
-    print(sys.exc_info())
-    traceback.print_exc()
+    app.logger.exception('Error retrieving info about the venue from the database')
   finally: db.session.close()
-  return render_template('pages/show_venue.html', venue=data)
+  # every start time of the page formatted in one go
+  startTimes = formatStartTimes(data['upcoming_shows'] + data['past_shows']) if data else {}
+  return render_template('pages/show_venue.html', venue=data, version=version, start_times=startTimes)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -262,139 +194,118 @@ def create_venue_submission():
   except InvalidData as e:
     error = True
     flash(message)
+    metrics.formInvalid(form)
     app.logger.error('Invalid venue data')
-  except:
+  except Exception:
     error = True
     db.session.rollback()
     flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')#data.name
-    app.logger.error('Venue could not be listed')
-    print(sys.exc_info())
+    app.logger.exception('Venue could not be listed')
   finally:
     db.session.close()
   return render_template('pages/home.html') if not error else render_template('forms/new_venue.html', form = form)
 
-@app.route('/venues/<int:venue_id>/delete') #methods=['DELETE'])
+# DELETE answers with JSON; the Delete button of the venue page posts the form instead.
+# A venue with more than VENUE_DELETE_BACKGROUND_SHOWS shows is deleted in the background
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+@app.route('/venues/<int:venue_id>/delete', methods=['POST'])
 def delete_venue(venue_id):
-  
+  error = background = False
   try:
-    if Venue.query.filter_by(id=venue_id).first() is None:
-      raise NoSuchId
-    venue = Venue.query.filter_by(id=venue_id).first()
-    db.session.delete(venue)
-    db.session.commit()
+    threshold = app.config['VENUE_DELETE_BACKGROUND_SHOWS']
+    if threshold and countVenueShows(venue_id) > threshold:
+      background = True
+      deleteVenueInBackground(app, venue_id)
+    else:
+      if not deleteVenue(venue_id):
+        raise NoSuchId
+      db.session.commit()
+      venueDeleted(venue_id)
   except(NoSuchId):
     app.logger.error('No such venue id')
+    if request.method == 'DELETE':
+      return jsonify({'error': 'not found'}), 404
     abort(404)
-  except:
+  except Exception:
+    error = True
     db.session.rollback()
-    app.logger.error('Error deleting venue')
-    print(sys.exc_info())
+    app.logger.exception('Error deleting venue')
   finally:
     db.session.close()
+  if request.method == 'DELETE':
+    if error:
+      return jsonify({'error': 'Venue could not be deleted'}), 500
+    return jsonify({'id': venue_id, 'deleted': not background}), 202 if background else 200
+  if error:
+    flash('An error occurred. Venue could not be deleted.')
+  elif background:
+    flash('Venue is being deleted.')
+  else:
+    flash('Venue was successfully deleted!')
   return render_template('pages/home.html')
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@queryBudget(2)
+@replicaRead
+@conditionalGet(lambda: listingValidatorsQuery(Artist))
 def artists():
+  pageArgs = getPageArgs(len(ARTIST_KEY))
+  data = []
+  page = None
+  # the version of the page data, which its cached fragments are keyed on
+  version = None
   try:
-    data = [{'id': artist.id, 'name': artist.name} for artist in Artist.query.all()]
-  except: app.logger.error('Error retrieving artists from the database')
+    page, version = pageCache.fetchVersioned('artists', pageKey(pageArgs) + (pageTag(),), lambda: getArtistsPage(pageArgs))
+    data = page.items
+  except Exception:
+    app.logger.exception('Error retrieving artists from the database')
   finally: db.session.close()
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, page=page, version=version)
 
 @app.route('/artists/search', methods=['POST'])
+@queryBudget(3)
+@replicaRead
 def search_artists():
-  def getNumberOfUpcomingShows(artist):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    return db.session.query(Show).join(Artist.shows).filter(Artist.id == artist.id).filter(Show.start_time >= now).count()
-
   # get info 
+  # first make an empty response to return even if there is an exception
+  response = {'count': 0, 'data': []}
   try:
     # get the string to look for
     word = request.form.get('search_term')
-    # find artists
-    results = Artist.query.filter(Artist.name.ilike(f'%{word}%')).all()
-    # get the needed data from the results
-    response = {
-      'count': len(results),
-      'data': [
-        {
-        'id': result.id,
-        'name': result.name, 
-        'num_upcoming_shows': getNumberOfUpcomingShows(result)
-        } for result in results
-      ]
-    }
-  except: 
-    app.logger.error('Error finding artist')
-    print(sys.exc_info())
+    # find artists, ranked by how well the names match, with the upcoming shows counted in the same query
+    response = search(Artist, word, getSearchLimit(request.form))
+  except Exception:
+    app.logger.exception('Error finding artist')
   finally: db.session.close()
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):  
-  def getUpcomingShows(artist):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    results = db.session.query(Show).join(Artist.shows).filter(Artist.id == artist.id).filter(Show.start_time >= now).all()
-    return [{
-      'venue_id': show.venue.id,
-      'venue_name': show.venue.name,
-      'venue_image_link': show.venue.image_link,
-      'start_time': show.start_time
-    } for show in results]
-
-  def getPastShows(artist):
-    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-    results = db.session.query(Show).join(Artist.shows).filter(Artist.id == artist.id).filter(Show.start_time < now).all()
-    return [{
-      'venue_id': show.venue.id,
-      'venue_name': show.venue.name,
-      'venue_image_link': show.venue.image_link,
-      'start_time': show.start_time
-    } for show in results]
-
+@queryBudget(3)
+@replicaRead
+@conditionalGet(artistValidatorsQuery)
+def show_artist(artist_id):
   # get info
   # first make an list fo return even if there is an exception
   data = []
+  version = None
   try:
-    # get the artist with the given id (there will actually be just one)
-    artists = Artist.query.filter_by(id=artist_id).all()
+    # get the artist with all their shows and their venues, split into upcoming and past shows
+    data, version = pageCache.fetchVersioned('artist', (artist_id, pageTag()), lambda: getArtistDetail(artist_id))
     # if there is no artist with the given id, raise error
-    if len(artists) == 0:
+    if data is None:
       raise NoSuchId
-    # if there is an artist with the given id, get a variable for this artist
-    artist = artists[0]
-    # get past and upcoming shows
-    pastShows = getPastShows(artist)
-    upcomingShows = getUpcomingShows(artist)
-    # put into to "data" from "artist"
-    data = {
-      'id': artist.id,
-      'name': artist.name,
-      'city': artist.city,
-      'state': artist.state,
-      'phone': artist.phone,
-      'genres': artist.genres,
-      'image_link': artist.image_link,
-      'facebook_link': artist.facebook_link,
-      'website': artist.website,
-      'seeking_venue': artist.seeking_venue,
-      'seeking_description': artist.seeking_description,
-      'past_shows': pastShows,
-      'upcoming_shows': upcomingShows,
-      'past_shows_count': len(pastShows),
-      'upcoming_shows_count': len(upcomingShows)
-    }
   except NoSuchId:
     app.logger.error('No such artist id')
     abort(404)
-  except:
+  except Exception:
     db.session.rollback()
-    app.logger.error('Error retrieving artist from the database')
-    print(sys.exc_info())
+    app.logger.exception('Error retrieving artist from the database')
   finally: db.session.close()
-  return render_template('pages/show_artist.html', artist=data)
+  # every start time of the page formatted in one go
+  startTimes = formatStartTimes(data['upcoming_shows'] + data['past_shows']) if data else {}
+  return render_template('pages/show_artist.html', artist=data, version=version, start_times=startTimes)
 
 #  Update
 #  ----------------------------------------------------------------
@@ -415,16 +326,16 @@ def edit_artist(artist_id):
       'facebook_link': artist.facebook_link,
       'seeking_venue': artist.seeking_venue,
       'seeking_description': artist.seeking_description,
-      'image_link': artist.image_link
+      'image_link': artist.image_link,
+      'version': artist.version
     }
     # for data from the dictionary to form that will be rendered to the user
     form = ArtistForm(MultiDict(artistDictionary))
   except NoSuchId:
     app.logger.error('No such id for artist')
     abort(404)
-  except:
-    app.logger.error('Error retrieving artist info from the database')
-    print(sys.exc_info())
+  except Exception:
+    app.logger.exception('Error retrieving artist info from the database')
   finally: db.session.close()
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -432,21 +343,11 @@ def edit_artist(artist_id):
 def edit_artist_submission(artist_id):
   try:
     error = False
+    status = 200
     # for data from the user into ArtistForm
     form = ArtistForm(request.form)
-    # get a handle for the artist in the database for an update
-    artist = db.session.query(Artist).filter_by(id=artist_id).first()
-    # update the artist with (possibly invalid) data from the form but don't commit yet
-    artist.name = form.name.data
-    artist.city = form.city.data 
-    artist.state = form.state.data
-    artist.phone = form.phone.data 
-    artist.genres= form.genres.data
-    artist.image_link = form.image_link.data
-    artist.facebook_link = form.facebook_link.data
-    artist.website = form.website_link.data
-    artist.seeking_venue = form.seeking_venue.data
-    artist.seeking_description = form.seeking_description.data 
+    # what the form page shows the artist as, if it has to be rendered again
+    artist = {'id': artist_id, 'name': form.name.data}
     
     # validate the form given by the user
     if not form.validate():
@@ -464,21 +365,35 @@ def edit_artist_submission(artist_id):
         message += ' ' + error
       raise InvalidData
     
+    # update the columns the form changes, if the artist is still at the version the form was filled from
+    if saveEdit(Artist, artist_id, form.version.data, formValues(form, ARTIST_FIELDS)) is None:
+      raise NoSuchId
     db.session.commit()
+    showsChanged()
     flash('Artist ' + request.form['name'] + ' was successfully updated!')
   except InvalidData as e:
     error = True
     flash(message)
+    metrics.formInvalid(form)
     app.logger.error('Invalid artist data')
+  except NoSuchId:
+    app.logger.error('No such id for artist')
+    abort(404)
+  except StaleEdit as e:
+    error = True
+    status = 409
+    db.session.rollback()
+    rebaseForm(form, e.version)
+    flash('Artist ' + form.name.data + ' was changed by someone else since this form was opened. Saving it again will overwrite their changes.')
+    app.logger.warning('Stale artist edit')
   except Exception as e:
     error = True
     db.session.rollback()
-    app.logger.error('Artist could not be updated in the database')
-    flash('An error occurred. Artist ' + artist.name + ' could not be updated.')
-    print(sys.exc_info())
+    app.logger.exception('Artist could not be updated in the database')
+    flash('An error occurred. Artist ' + form.name.data + ' could not be updated.')
   finally: db.session.close()
   # render the artist info page, but if error, stay of the artist form page with possibly invalid data just given by the user
-  return redirect(url_for('show_artist', artist_id=artist_id)) if not error else render_template('forms/edit_artist.html', form=form, artist = artist)
+  return redirect(url_for('show_artist', artist_id=artist_id)) if not error else (render_template('forms/edit_artist.html', form=form, artist = artist), status)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
@@ -499,7 +414,8 @@ def edit_venue(venue_id):
       'genres': venue.genres,
       'website': venue.website,
       'seeking_talent': venue.seeking_talent,
-      'seeking_description': venue.seeking_description
+      'seeking_description': venue.seeking_description,
+      'version': venue.version
     }
     # put data from the dictionary to a VenueForm
     form = VenueForm(MultiDict(venueDictionary))
@@ -509,8 +425,7 @@ def edit_venue(venue_id):
     abort(404)
   except Exception:
     error = True
-    app.logger.error('Error retrieving venue info from the database')
-    print(sys.exc_info())
+    app.logger.exception('Error retrieving venue info from the database')
   finally: db.session.close()
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
@@ -518,22 +433,11 @@ def edit_venue(venue_id):
 def edit_venue_submission(venue_id):
   try:
     error = False
+    status = 200
     # create a VenueForm and populate with data given by the user
     form = VenueForm(request.form)
-    # find the venue to update
-    venue = db.session.query(Venue).filter_by(id=venue_id).first()
-    # update the venue with (possibly invalid) data from the form, but don't commit yet
-    venue.name = form.name.data
-    venue.city = form.city.data 
-    venue.state = form.state.data
-    venue.address = form.address.data
-    venue.phone = form.phone.data
-    venue.image_link = form.image_link.data
-    venue.facebook_link = form.facebook_link.data
-    venue.genres= form.genres.data
-    venue.website = form.website_link.data
-    venue.seeking_talent = form.seeking_talent.data
-    venue.seeking_description = form.seeking_description.data
+    # what the form page shows the venue as, if it has to be rendered again
+    venue = {'id': venue_id, 'name': form.name.data}
     
     # validate form
     if not form.validate():
@@ -551,21 +455,35 @@ def edit_venue_submission(venue_id):
         message += ' ' + error
       raise InvalidData
     
+    # update the columns the form changes, if the venue is still at the version the form was filled from
+    if saveEdit(Venue, venue_id, form.version.data, formValues(form, VENUE_FIELDS)) is None:
+      raise NoSuchId
     db.session.commit()
+    showsChanged()
     flash('Venue ' + request.form['name'] + ' was successfully updated!')
   except InvalidData as e:
     error = True
     flash(message)
+    metrics.formInvalid(form)
     app.logger.error('Invalid venue data')
+  except NoSuchId:
+    app.logger.error('No such id for venue')
+    abort(404)
+  except StaleEdit as e:
+    error = True
+    status = 409
+    db.session.rollback()
+    rebaseForm(form, e.version)
+    flash('Venue ' + form.name.data + ' was changed by someone else since this form was opened. Saving it again will overwrite their changes.')
+    app.logger.warning('Stale venue edit')
   except Exception as e:
     error = True
     db.session.rollback()
-    app.logger.error('Venue could not be updated in the database')
-    flash('An error occurred. Venue ' + venue.name + ' could not be updated.')
-    print(sys.exc_info())
+    app.logger.exception('Venue could not be updated in the database')
+    flash('An error occurred. Venue ' + form.name.data + ' could not be updated.')
   finally: db.session.close()
   # render venue info page, but, if error, stay on the venue form page and render invalid data to user for correction
-  return redirect(url_for('show_venue', venue_id=venue_id)) if not error else render_template('forms/edit_venue.html', form=form, venue = venue)
+  return redirect(url_for('show_venue', venue_id=venue_id)) if not error else (render_template('forms/edit_venue.html', form=form, venue = venue), status)
 
 #  Create Artist
 #  ----------------------------------------------------------------
@@ -613,13 +531,13 @@ def create_artist_submission():
   except InvalidData as e:
     error = True
     flash(message)
+    metrics.formInvalid(form)
     app.logger.error('Invalid artist data')
-  except:
+  except Exception:
     error = True
     db.session.rollback()
-    app.logger.error('Artist could not be inserted into the database')
+    app.logger.exception('Artist could not be inserted into the database')
     flash('An error occurred. Artist ' + artist.name + ' could not be listed.')
-    print(sys.exc_info())
   finally: db.session.close()
   return render_template('pages/home.html') if not error else render_template('forms/new_artist.html', form = form)
 
@@ -628,17 +546,25 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@queryBudget(1)
+@replicaRead
 def shows():
-  shows = db.session.query(Show).all()
-  data = [{
-    'venue_id': show.venue.id,
-    'venue_name': show.venue.name,
-    'artist_id': show.artist.id,
-    'artist_name': show.artist.name,
-    'artist_image_link': show.artist.image_link,
-    'start_time': show.start_time
-  } for show in shows]
-  return render_template('pages/shows.html', shows=data)
+  pageArgs = getPageArgs(len(SHOW_KEY))
+  data = []
+  page = None
+  # the version of the page data, which its cached fragments are keyed on
+  version = None
+  try:
+    # get a page of shows together with their venues and artists; a client that has just written gets it from
+    # the primary, and puts it in the cache in place of a page that may have come from a replica behind it
+    fetch = pageCache.refresh if replicas.readsPrimary() else pageCache.fetchVersioned
+    page, version = fetch('shows', pageKey(pageArgs), lambda: getShowsPage(pageArgs))
+    data = page.items
+  except Exception:
+    app.logger.exception('Error retrieving shows from the database')
+  finally: db.session.close()
+  # every start time of the page formatted in one go
+  return render_template('pages/shows.html', shows=data, page=page, version=version, start_times=formatStartTimes(data))
 
 @app.route('/shows/create')
 def create_shows():
@@ -658,18 +584,85 @@ def create_show_submission():
     )
     db.session.add(show)
     db.session.commit()
+    showsChanged()
     flash('Show was successfully listed!')
-  except: 
+  except Exception:
     error = True
     db.session.rollback()
     flash('An error occurred. Show could not be listed.')
-    app.logger.error('Error inserting the show into the database')
-    print(sys.exc_info())
+    app.logger.exception('Error inserting the show into the database')
   finally:
     db.session.close()
   # if error, stay on the page
   return render_template('pages/home.html') if error == False else render_template('forms/new_show.html', form = form)
 
+#  API
+#  ----------------------------------------------------------------
+
+# venues, artists and shows as JSON for partner integrations
+app.register_blueprint(api, url_prefix='/api/v1')
+
+#  Import
+#  ----------------------------------------------------------------
+
+# flask import venues.csv (or artists.jsonl, shows.csv, ...)
+app.cli.add_command(importCommand)
+
+#  Assets
+#  ----------------------------------------------------------------
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+  # the bundled, fingerprinted files written by flask build-assets
+  return assets.serveAsset(filename)
+
+#  Cache
+#  ----------------------------------------------------------------
+
+@app.route('/cache/stats')
+def cache_stats():
+  # hits, misses and evictions of the page cache
+  return jsonify(pageCache.stats())
+
+#  Request stats
+#  ----------------------------------------------------------------
+
+@app.route('/request/stats')
+def request_stats():
+  # statements, database time, template time and total time of every route of this process
+  return jsonify(routeStats())
+
+#  Database pool
+#  ----------------------------------------------------------------
+
+@app.route('/pool/stats')
+def pool_stats():
+  # connections checked out, overflow and checkout wait times of the connection pools of this process
+  return jsonify(poolStats())
+
+#  Health
+#  ----------------------------------------------------------------
+
+@app.route('/ready')
+def ready():
+  # ready for traffic once the database answers; load balancers leave the worker out otherwise
+  try:
+    db.session.execute(text('SELECT 1'))
+    return jsonify({'status': 'ready'})
+  except Exception:
+    app.logger.exception('Database not reachable')
+    return jsonify({'status': 'unavailable'}), 503
+  finally:
+    db.session.close()
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def metrics_endpoint():
+  # request latency, requests in flight, pools, cache and form failures in the Prometheus text format
+  return Response(metrics.render(app), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -679,16 +672,6 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -701,4 +684,5 @@ if not app.debug:
 
 if __name__ == '__main__':
     #port = int(os.environ.get('PORT', 5000))
+    counters.startWithDevServer(app)
     app.run(host='0.0.0.0', port=3000)
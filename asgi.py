@@ -0,0 +1,215 @@
+# ASGI entry point, for serving with more requests in flight than threads:
+#
+#   uvicorn asgi:application --port 3000 --workers 4
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#
+# The read-heavy routes (venue and artist pages, and the searches) are served by coroutines on the async engine
+# (asyncdb.py), so a request waiting for the database holds no thread, and the statements of a page that do not
+# depend on each other run at the same time. Every other route goes to the WSGI app on ASGI_THREADS threads.
+# The coroutines run in a Flask request context like any view, so the before/after request hooks (metrics,
+# logs, query budgets), error handlers and templates are the ones of the WSGI app.
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from flask import render_template, request, abort, g, request_started
+from werkzeug.exceptions import HTTPException
+import asyncdb
+import replicas
+from start import app, loadRoutes
+from cache import pageCache
+from dates import formatStartTimes
+from instrumentation import queryBudget
+import conditional
+from conditional import conditionalGet, pageTag
+from models import Venue, Artist
+from queries import getVenueDetailAsync, getArtistDetailAsync, venueValidatorsQuery, artistValidatorsQuery
+from search import searchAsync, getLimit as getSearchLimit
+
+loadRoutes()
+
+# the routes served on the event loop, by endpoint
+
+@queryBudget(4)
+@conditionalGet(venueValidatorsQuery)
+async def show_venue(venue_id):
+    data = []
+    version = None
+    try:
+        # the venue, its upcoming shows and its past shows at the same time
+        data, version = await pageCache.fetchVersionedAsync('venue', (venue_id, pageTag()), lambda: getVenueDetailAsync(venue_id))
+    except Exception:
+        app.logger.exception('Error retrieving info about the venue from the database')
+    if data is None:
+        app.logger.error('No such venue id')
+        abort(404)
+    startTimes = formatStartTimes(data['upcoming_shows'] + data['past_shows']) if data else {}
+    return render_template('pages/show_venue.html', venue=data, version=version, start_times=startTimes)
+
+@queryBudget(4)
+@conditionalGet(artistValidatorsQuery)
+async def show_artist(artist_id):
+    data = []
+    version = None
+    try:
+        data, version = await pageCache.fetchVersionedAsync('artist', (artist_id, pageTag()), lambda: getArtistDetailAsync(artist_id))
+    except Exception:
+        app.logger.exception('Error retrieving artist from the database')
+    if data is None:
+        app.logger.error('No such artist id')
+        abort(404)
+    startTimes = formatStartTimes(data['upcoming_shows'] + data['past_shows']) if data else {}
+    return render_template('pages/show_artist.html', artist=data, version=version, start_times=startTimes)
+
+@queryBudget(3)
+async def search_venues():
+    response = {'count': 0, 'data': []}
+    try:
+        response = await searchAsync(Venue, request.form.get('search_term'), getSearchLimit(request.form))
+    except Exception:
+        app.logger.exception('Error finding venues')
+    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@queryBudget(3)
+async def search_artists():
+    response = {'count': 0, 'data': []}
+    try:
+        response = await searchAsync(Artist, request.form.get('search_term'), getSearchLimit(request.form))
+    except Exception:
+        app.logger.exception('Error finding artist')
+    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+VIEWS = {
+    'show_venue': show_venue,
+    'show_artist': show_artist,
+    'search_venues': search_venues,
+    'search_artists': search_artists
+}
+
+# the other routes, which block, run on these threads
+executor = ThreadPoolExecutor(app.config['ASGI_THREADS'], thread_name_prefix = 'wsgi')
+
+# the WSGI environ of an ASGI request
+def makeEnviron(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+async def readBody(receive):
+    body = []
+    while True:
+        message = await receive()
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(body)
+
+def asgiHeaders(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+# run a coroutine view the way Flask runs a view: in a request context, between the request hooks,
+# with the error handlers of the app
+async def dispatch(view, environ):
+    context = app.request_context(environ)
+    context.push()
+    error = None
+    try:
+        try:
+            g.asyncView = view
+            request_started.send(app)
+            response = app.preprocess_request()
+            if response is None:
+                response = await conditional.beforeRequestAsync(app, view)
+            if response is None:
+                response = await view(**request.view_args)
+        except Exception as e:
+            error = e
+            response = app.handle_user_exception(e)
+        return app.finalize_request(response)
+    except Exception as e:
+        error = e
+        return app.handle_exception(e)
+    finally:
+        context.pop(error)
+
+async def serveAsync(view, environ, send):
+    response = await dispatch(view, environ)
+    try:
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': asgiHeaders(response.headers.to_wsgi_list())})
+        await send({'type': 'http.response.body', 'body': b'' if environ['REQUEST_METHOD'] == 'HEAD' else response.get_data()})
+    finally:
+        response.close()
+
+# a route of the WSGI app, on a thread; the body is read and sent from that same thread, as a streamed
+# response keeps its request context while it is read
+async def serveWsgi(environ, send):
+    loop = asyncio.get_running_loop()
+
+    def respond(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def run():
+        started = []
+        def startResponse(status, headers, excInfo = None):
+            started[:] = [int(status.split(' ', 1)[0]), asgiHeaders(headers)]
+        body = app(environ, startResponse)
+        try:
+            respond({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            for chunk in body:
+                if chunk:
+                    respond({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            respond({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    await loop.run_in_executor(executor, run)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncdb.dispose()
+            if replicas.router is not None:
+                await replicas.router.disposeAsync()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    environ = makeEnviron(scope, await readBody(receive))
+    try:
+        endpoint = app.url_map.bind_to_environ(environ).match()[0]
+    except HTTPException:
+        endpoint = None
+    if endpoint in VIEWS:
+        await serveAsync(VIEWS[endpoint], environ, send)
+    else:
+        await serveWsgi(environ, send)
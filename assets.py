@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import click
+from flask import current_app, request, send_file, abort, url_for
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# the files the pages load, bundled in this order into one file each; names are relative to the static folder
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css'
+    ],
+    # the deferred scripts, which run in this order
+    'js/app.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js'
+    ]
+}
+
+# files the pages load on their own (scripts that must run early or only on some browsers, images);
+# they are fingerprinted and compressed, but not bundled
+FILES = [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+    'js/libs/respond-1.4.2.min.js',
+    'js/libs/jquery-1.11.1.min.js',
+    'img/front-splash.jpg'
+]
+
+# only text compresses; images are already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map')
+
+# a fingerprinted file never changes, so browsers may keep it for a year without asking again
+MAX_AGE = 365 * 24 * 60 * 60
+
+CSS_TOKEN = re.compile(r'(/\*.*?\*/)|("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+def distFolder(app):
+    return os.path.join(app.static_folder, 'dist')
+
+# drop comments (but /*! licences) and white space the browser does not need; strings are left as they are
+def minifyCss(text):
+    kept = []
+    def hide(match):
+        comment, string = match.groups()
+        if comment and not comment.startswith('/*!'):
+            return ' '
+        kept.append(string or comment + '\n')
+        return '\0%d\0' % (len(kept) - 1)
+    code = re.sub(r'\s+', ' ', CSS_TOKEN.sub(hide, text))
+    code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+    code = code.replace(': ', ':').replace(';}', '}')
+    return re.sub('\0(\\d+)\0', lambda match: kept[int(match.group(1))], code).strip() + '\n'
+
+# without a JavaScript parser only the safe part is done: indentation, blank lines and whole-line comments go,
+# line breaks stay (automatic semicolon insertion depends on them)
+def minifyJs(text):
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+# urls in a stylesheet are relative to where it is; the bundle is somewhere else, so make them absolute
+def absoluteUrls(text, name, staticUrl):
+    base = posixpath.dirname(posixpath.join(staticUrl, name))
+    def resolve(match):
+        quote, url = match.groups()
+        if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+            return match.group(0)
+        return 'url(%s%s%s)' % (quote, posixpath.normpath(posixpath.join(base, url)), quote)
+    return CSS_URL.sub(resolve, text)
+
+# the text of a bundle, each file minified unless it already is
+def buildBundle(app, name, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(app.static_folder, source), encoding = 'utf-8') as file:
+            text = file.read()
+        if name.endswith('.css'):
+            text = absoluteUrls(text, source, app.static_url_path)
+        if '.min.' not in source:
+            text = (minifyCss if name.endswith('.css') else minifyJs)(text)
+        parts.append(text.rstrip('\n'))
+    # a ; between scripts, in case one does not end its last statement
+    return ('\n' if name.endswith('.css') else '\n;\n').join(parts).encode('utf-8') + b'\n'
+
+# write a file under its fingerprinted name, with gzip and brotli variants; gives that name
+def writeAsset(app, name, data):
+    stem, extension = posixpath.splitext(name)
+    fingerprinted = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], extension)
+    path = os.path.join(distFolder(app), fingerprinted)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'wb') as file:
+        file.write(data)
+    if extension in COMPRESSIBLE:
+        # no timestamp in the header, so the same input always gives the same bytes
+        with open(path + '.gz', 'wb') as file:
+            file.write(gzip.compress(data, 9, mtime = 0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as file:
+                file.write(brotli.compress(data, quality = 11))
+    return fingerprinted
+
+@click.command('build-assets')
+@with_appcontext
+@click.option('--clean', is_flag = True, help = 'Remove the files of earlier builds.')
+def buildAssetsCommand(clean):
+    '''Bundle, minify, fingerprint and precompress the static files.'''
+    app = current_app
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        manifest[name] = writeAsset(app, name, buildBundle(app, name, sources))
+    for name in FILES:
+        with open(os.path.join(app.static_folder, name), 'rb') as file:
+            manifest[name] = writeAsset(app, name, file.read())
+    path = os.path.join(distFolder(app), 'manifest.json')
+    # written aside and renamed, so a worker starting meanwhile reads the old manifest or the new one
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent = 2, sort_keys = True)
+    os.replace(path + '.tmp', path)
+
+    # pages rendered before the build still point at the old files, so they are only removed when asked
+    if clean:
+        keep = set(manifest.values())
+        for folder, directories, files in os.walk(distFolder(app)):
+            for file in files:
+                relative = os.path.relpath(os.path.join(folder, file), distFolder(app)).replace(os.sep, '/')
+                if relative != 'manifest.json' and re.sub(r'\.(gz|br)$', '', relative) not in keep:
+                    os.remove(os.path.join(folder, file))
+
+    for name in sorted(manifest):
+        click.echo('%s -> %s' % (name, manifest[name]))
+    if brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written.', err = True)
+
+# logical name -> fingerprinted name, from the last build; empty until the assets are built
+manifest = {}
+
+def loadManifest(app):
+    global manifest
+    try:
+        with open(os.path.join(distFolder(app), 'manifest.json')) as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        manifest = {}
+
+# like url_for('static', filename = name), but the fingerprinted file once the assets are built
+def assetUrl(filename):
+    if filename in manifest:
+        return url_for('asset', filename = manifest[filename])
+    return url_for('static', filename = filename)
+
+# the urls to load a bundle from: the built file, or each of its files as they are before a build
+def assetUrls(bundle):
+    if bundle in manifest:
+        return [url_for('asset', filename = manifest[bundle])]
+    return [url_for('static', filename = source) for source in BUNDLES[bundle]]
+
+# a built file, precompressed when the browser takes it, cached for good
+def serveAsset(filename):
+    path = safe_join(distFolder(current_app), filename)
+    if path is None or not os.path.isfile(path) or filename == 'manifest.json' or filename.endswith(('.gz', '.br')):
+        abort(404)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            encoding = name
+            path += suffix
+            break
+    response = send_file(path, mimetype = mimetype, conditional = True, max_age = MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init(app):
+    loadManifest(app)
+    app.jinja_env.globals['asset_url'] = assetUrl
+    app.jinja_env.globals['asset_urls'] = assetUrls
+    app.cli.add_command(buildAssetsCommand)
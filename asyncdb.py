@@ -0,0 +1,44 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from dbpool import engineOptions
+from replicas import currentReplica
+from start import app
+
+# the async driver of each database the app runs on
+DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+# the database url of the config with the async driver of its database
+def asyncUrl(uri):
+    url = make_url(uri)
+    return url.set(drivername = DRIVERS[url.get_backend_name()])
+
+# the async engine of this process, made on first use so that it belongs to the event loop of the server
+# (and to a worker rather than the process it was forked from); its pool has the DB_* settings of the config
+engine = None
+
+# the engine of the replica the request reads from, or that of the primary
+def getEngine():
+    global engine
+    replica = currentReplica()
+    if replica is not None:
+        return replica.getAsyncEngine()
+    if engine is None:
+        url = asyncUrl(app.config['SQLALCHEMY_DATABASE_URI'])
+        options = engineOptions(app.config, url.render_as_string(hide_password = False), 'async', AsyncAdaptedQueuePool)
+        engine = create_async_engine(url, **options)
+    return engine
+
+# all the rows of a statement, on a connection of its own so that statements can run at the same time
+async def fetchAll(statement):
+    async with getEngine().connect() as connection:
+        return (await connection.execute(statement)).all()
+
+async def dispose():
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
@@ -0,0 +1,50 @@
+# Compare ways of formatting the start times of a page of shows: the old filter (parse a string, then
+# babel.dates.format_datetime), Babel on the datetimes, the memoized filter, and the batch formatter.
+#
+#   python benchmarks/datetime_filter.py [number of shows] [number of distinct start times]
+
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+from dates import FORMATS, formatDatetime, formatStartTimes, formatMemo
+
+# a reproducible page of shows, with start times on the hour drawn from a few weeks
+def makeShows(count, distinct, seed = 1):
+    random.seed(seed)
+    start = datetime(2026, 1, 1, 20, tzinfo = timezone.utc)
+    times = [start + timedelta(hours = random.randrange(24 * 60)) for i in range(distinct)]
+    return [{'start_time': random.choice(times)} for i in range(count)]
+
+def byParsing(shows):
+    return [babel.dates.format_datetime(dateutil.parser.parse(str(show['start_time'])), FORMATS['full'], locale = 'en') for show in shows]
+
+def byBabel(shows):
+    return [babel.dates.format_datetime(show['start_time'], FORMATS['full'], locale = 'en') for show in shows]
+
+def byFilter(shows):
+    return [formatDatetime(show['start_time'], 'full') for show in shows]
+
+def byBatch(shows):
+    texts = formatStartTimes(shows)
+    return [texts[show['start_time']] for show in shows]
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    shows = makeShows(count, distinct)
+    expected = byParsing(shows)
+    assert byBabel(shows) == expected and byFilter(shows) == expected and byBatch(shows) == expected, 'the paths disagree'
+    print('%d shows, %d distinct start times' % (count, distinct))
+    baseline = None
+    for name, format in (('parse', byParsing), ('babel', byBabel), ('filter', byFilter), ('batch', byBatch)):
+        # every run starts without a memo, as the first render after a restart would
+        seconds = min(timeit.repeat(lambda: format(shows), setup = formatMemo.cache_clear, number = 1, repeat = 5))
+        baseline = baseline or seconds
+        print('%-7s %8.1f ms %10.0f shows/s %6.1fx' % (name, seconds * 1000, count / seconds, baseline / seconds))
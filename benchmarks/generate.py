@@ -0,0 +1,206 @@
+# Fill the database with a reproducible set of venues, artists and shows for benchmarks: cities and genres
+# drawn with the skew real listings have (a few big cities and popular genres, a long tail of small ones),
+# and shows concentrated on the more popular venues and artists, half of them in the past.
+#
+#   BENCHMARK_DATABASE_URL=sqlite:////tmp/fyyur-bench.db python benchmarks/generate.py --size 10000
+#   python benchmarks/generate.py --venues 1000 --artists 5000 --shows 100000 --seed 7 --reset
+#
+# The target is the database of BENCHMARK_DATABASE_URL, PostgreSQL or SQLite, which the app is pointed at
+# instead of its own (DATABASE_URL) for the run; the scripts refuse to run without it, or when it names the
+# app's database. --reset drops its tables.
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.engine import make_url
+from enums import Genre
+
+# (city, state, metro population in millions); picked in proportion to population
+CITIES = [
+    ('New York', 'NY', 19.5), ('Los Angeles', 'CA', 12.9), ('Chicago', 'IL', 9.4), ('Dallas', 'TX', 7.9),
+    ('Houston', 'TX', 7.3), ('Washington', 'DC', 6.3), ('Philadelphia', 'PA', 6.2), ('Miami', 'FL', 6.1),
+    ('Atlanta', 'GA', 6.1), ('Boston', 'MA', 4.9), ('Phoenix', 'AZ', 4.9), ('San Francisco', 'CA', 4.6),
+    ('Detroit', 'MI', 4.3), ('Seattle', 'WA', 4.0), ('Minneapolis', 'MN', 3.7), ('San Diego', 'CA', 3.3),
+    ('Tampa', 'FL', 3.2), ('Denver', 'CO', 3.0), ('Baltimore', 'MD', 2.8), ('St. Louis', 'MO', 2.8),
+    ('Orlando', 'FL', 2.7), ('Charlotte', 'NC', 2.7), ('San Antonio', 'TX', 2.6), ('Portland', 'OR', 2.5),
+    ('Sacramento', 'CA', 2.4), ('Pittsburgh', 'PA', 2.4), ('Austin', 'TX', 2.4), ('Las Vegas', 'NV', 2.3),
+    ('Cincinnati', 'OH', 2.3), ('Kansas City', 'MO', 2.2), ('Columbus', 'OH', 2.1), ('Indianapolis', 'IN', 2.1),
+    ('Cleveland', 'OH', 2.1), ('Nashville', 'TN', 2.0), ('New Orleans', 'LA', 1.3), ('Salt Lake City', 'UT', 1.3),
+    ('Louisville', 'KY', 1.3), ('Memphis', 'TN', 1.3), ('Richmond', 'VA', 1.3), ('Birmingham', 'AL', 1.1),
+    ('Tucson', 'AZ', 1.0), ('Albuquerque', 'NM', 0.9), ('Omaha', 'NE', 0.97), ('Boise', 'ID', 0.8),
+    ('Anchorage', 'AK', 0.4), ('Burlington', 'VT', 0.2), ('Missoula', 'MT', 0.12), ('Bozeman', 'MT', 0.12)
+]
+
+# (genre, weight); picked in proportion to the weight, one to three per venue or artist
+# (the names of the Genre members, which are what the forms store and validate)
+GENRES = [(genre.name, weight) for genre, weight in (
+    (Genre.Rock_n_Roll, 20), (Genre.Pop, 18), (Genre.Hip_Hop, 15), (Genre.Jazz, 10), (Genre.Electronic, 10),
+    (Genre.R_and_B, 8), (Genre.Alternative, 8), (Genre.Country, 7), (Genre.Folk, 6), (Genre.Blues, 5),
+    (Genre.Soul, 5), (Genre.Punk, 4), (Genre.Classical, 4), (Genre.Heavy_Metal, 4), (Genre.Funk, 3),
+    (Genre.Instrumental, 2), (Genre.Musical_Theatre, 2), (Genre.Raggae, 2), (Genre.Other, 1)
+)]
+
+NAME_WORDS = [
+    'Blue', 'Red', 'Golden', 'Silver', 'Velvet', 'Electric', 'Midnight', 'Lucky', 'Wild', 'Little', 'Grand',
+    'Old', 'New', 'Broken', 'Hidden', 'Rusty', 'Neon', 'Crystal', 'Black', 'Green', 'Echo', 'Rebel', 'Sonic'
+]
+VENUE_NOUNS = ['Room', 'Hall', 'Tavern', 'Lounge', 'Club', 'Theatre', 'Bar', 'Ballroom', 'Cellar', 'Garden', 'Stage']
+ARTIST_NOUNS = ['Wolves', 'Saints', 'Keys', 'Riders', 'Owls', 'Kings', 'Hearts', 'Ghosts', 'Tigers', 'Strings']
+STREETS = ['Main St', 'Market St', 'Broadway', 'Oak Ave', 'Elm St', 'Sunset Blvd', '1st Ave', 'Mission St']
+
+# rows inserted with one executemany
+CHUNK = 10000
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+def pickGenres(rng, genres, cumWeights):
+    count = rng.choice((1, 1, 2, 2, 2, 3))
+    return sorted(set(rng.choices(genres, cum_weights = cumWeights, k = count)))
+
+def phone(rng):
+    return '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999))
+
+def venueRow(rng, i, city, genres):
+    name = '%s %s %s %d' % (rng.choice(NAME_WORDS), rng.choice(NAME_WORDS), rng.choice(VENUE_NOUNS), i)
+    return {
+        'name': 'The ' + name,
+        'city': city[0],
+        'state': city[1],
+        'address': '%d %s' % (rng.randint(1, 9999), rng.choice(STREETS)),
+        'phone': phone(rng),
+        'image_link': 'https://images.example.com/venues/%d.jpg' % i,
+        'facebook_link': 'https://www.facebook.com/venue%d' % i,
+        'genres': genres,
+        'website': 'https://venue%d.example.com' % i,
+        'seeking_talent': rng.random() < 0.3,
+        'seeking_description': 'Looking for local acts.' if rng.random() < 0.3 else ''
+    }
+
+def artistRow(rng, i, city, genres):
+    return {
+        'name': '%s %s %d' % (rng.choice(NAME_WORDS), rng.choice(ARTIST_NOUNS), i),
+        'city': city[0],
+        'state': city[1],
+        'phone': phone(rng),
+        'genres': genres,
+        'image_link': 'https://images.example.com/artists/%d.jpg' % i,
+        'facebook_link': 'https://www.facebook.com/artist%d' % i,
+        'website': 'https://artist%d.example.com' % i,
+        'seeking_venue': rng.random() < 0.3,
+        'seeking_description': 'Looking for a stage.' if rng.random() < 0.3 else ''
+    }
+
+def insertChunks(db, model, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            db.session.execute(insert(model), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(model), chunk)
+    db.session.commit()
+
+# point the app at the benchmark database instead of its own; runs before the app (and its config) is imported
+def useBenchmarkDatabase():
+    uri = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not uri:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a database whose tables can be dropped.')
+    appUri = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = uri
+    from config import DEFAULT_DATABASE_URL
+    for other in (appUri, DEFAULT_DATABASE_URL):
+        if other and make_url(other).database == make_url(uri).database:
+            raise SystemExit('Not using %s, the database of the app, for benchmarks.' % make_url(uri).database)
+
+# the tables of a database are only dropped when it is the one BENCHMARK_DATABASE_URL names
+def checkDisposable(uri):
+    benchmarkUri = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not benchmarkUri or make_url(uri).render_as_string(hide_password = False) != make_url(benchmarkUri).render_as_string(hide_password = False):
+        raise SystemExit('Not dropping the tables of %s, which BENCHMARK_DATABASE_URL does not name.' % make_url(uri).database)
+
+# drop and make the tables again (PostgreSQL needs pg_trgm for the search indexes)
+def resetDatabase(db):
+    checkDisposable(db.engine.url)
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as connection:
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    db.drop_all()
+    db.create_all()
+
+# add the venues, artists and shows (to whatever is there); must run in an app context
+def generate(db, venues, artists, shows, seed = 1, now = None):
+    from models import Venue, Artist, Show
+    from counters import rebuild
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc).replace(minute = 0, second = 0, microsecond = 0)
+    cities = [(city, state) for city, state, population in CITIES]
+    cityWeights = cumulative([population for city, state, population in CITIES])
+    genres = [genre for genre, weight in GENRES]
+    genreWeights = cumulative([weight for genre, weight in GENRES])
+
+    firstVenue = (db.session.query(db.func.max(Venue.id)).scalar() or 0) + 1
+    firstArtist = (db.session.query(db.func.max(Artist.id)).scalar() or 0) + 1
+    insertChunks(db, Venue, (venueRow(rng, firstVenue + i, rng.choices(cities, cum_weights = cityWeights)[0],
+        pickGenres(rng, genres, genreWeights)) for i in range(venues)))
+    insertChunks(db, Artist, (artistRow(rng, firstArtist + i, rng.choices(cities, cum_weights = cityWeights)[0],
+        pickGenres(rng, genres, genreWeights)) for i in range(artists)))
+
+    # popularity falls off with rank (Zipf), so a few venues and artists have many shows and most have few;
+    # the ids are read back, as a PostgreSQL sequence can be ahead of the highest id
+    venueIds = list(db.session.execute(select(Venue.id).where(Venue.id >= firstVenue).order_by(Venue.id)).scalars())
+    artistIds = list(db.session.execute(select(Artist.id).where(Artist.id >= firstArtist).order_by(Artist.id)).scalars())
+    rng.shuffle(venueIds)
+    rng.shuffle(artistIds)
+    venueWeights = cumulative([1 / rank for rank in range(1, len(venueIds) + 1)])
+    artistWeights = cumulative([1 / rank for rank in range(1, len(artistIds) + 1)])
+
+    def showRows():
+        for i in range(shows):
+            # evenings, from a year ago to a year ahead
+            day = now + timedelta(days = rng.randint(-365, 365))
+            yield {
+                'venue_id': rng.choices(venueIds, cum_weights = venueWeights)[0],
+                'artist_id': rng.choices(artistIds, cum_weights = artistWeights)[0],
+                'start_time': day.replace(hour = rng.choice((18, 19, 20, 21, 22)))
+            }
+    if venueIds and artistIds:
+        insertChunks(db, Show, showRows())
+    # the bulk inserts skip the ORM, so the show counters of venues and artists are counted afterwards
+    rebuild(db.session.connection(), now)
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Fill the database with synthetic venues, artists and shows.')
+    parser.add_argument('--size', type = int, help = 'Venues and artists to make, with ten times as many shows.')
+    parser.add_argument('--venues', type = int, default = 1000)
+    parser.add_argument('--artists', type = int, default = 1000)
+    parser.add_argument('--shows', type = int, default = 10000)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--reset', action = 'store_true', help = 'Drop and make the tables first.')
+    args = parser.parse_args()
+    if args.size:
+        args.venues = args.artists = args.size
+        args.shows = args.size * 10
+
+    useBenchmarkDatabase()
+    from start import app, db
+    import models
+    with app.app_context():
+        if args.reset:
+            resetDatabase(db)
+        started = time.monotonic()
+        generate(db, args.venues, args.artists, args.shows, args.seed)
+        print('%d venues, %d artists and %d shows in %.1fs' % (args.venues, args.artists, args.shows, time.monotonic() - started))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# Load the app over HTTP with a weighted mix of requests from a growing number of concurrent clients, and
+# report the throughput, latency percentiles and error rate of every step as JSON, to compare commits.
+#
+#   python benchmarks/loadtest.py --output load.json
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 8,32,128 --seconds 30
+#
+# Without --url the app is started locally (flask run, threaded, on a free port) on the database of
+# BENCHMARK_DATABASE_URL when it is set (that of the config otherwise), and stopped at the end; generate data
+# first with generate.py. Show creation writes to that database.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_WORDS = ('blue', 'the', 'hall', 'club', 'wolves', 'neon room', 'zzz')
+
+# (name, weight, method, path, form data) made from the client's random generator and the known ids
+MIX = [
+    ('venues', 40, lambda rng, ids: ('GET', '/venues', None)),
+    ('show_artist', 30, lambda rng, ids: ('GET', '/artists/%d' % rng.choice(ids['artists']), None)),
+    ('search_venues', 20, lambda rng, ids: ('POST', '/venues/search', {'search_term': rng.choice(SEARCH_WORDS)})),
+    ('create_show', 10, lambda rng, ids: ('POST', '/shows/create', {
+        'venue_id': rng.choice(ids['venues']),
+        'artist_id': rng.choice(ids['artists']),
+        'start_time': '2030-%02d-%02d 20:00:00' % (rng.randint(1, 12), rng.randint(1, 28))
+    }))
+]
+
+def freePort():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# the app under the development server, the way app.run() starts it but on a free port and without reloading
+def startServer(port):
+    environment = dict(os.environ, DEBUG = 'false')
+    if os.environ.get('BENCHMARK_DATABASE_URL'):
+        environment['DATABASE_URL'] = os.environ['BENCHMARK_DATABASE_URL']
+    command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads', '--no-reload', '--no-debugger']
+    server = subprocess.Popen(command, cwd = ROOT, env = environment, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit('the server exited with %d' % server.returncode)
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout = 1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('the server did not start')
+
+# one client with its own connection, which is opened again whenever the server closes it
+class Client:
+    def __init__(self, url, timeout):
+        parts = urllib.parse.urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout = timeout)
+
+    def request(self, method, path, form = None):
+        body = urllib.parse.urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+
+    def close(self):
+        self.connection.close()
+
+# ids to draw from, read from the start of the JSON API collections without downloading all of them
+def knownIds(url, collection, limit = 1000):
+    parts = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout = 30)
+    connection.request('GET', '/api/v1/' + collection)
+    response = connection.getresponse()
+    ids = []
+    for line in response:
+        if line.strip():
+            ids.append(json.loads(line)['id'])
+        if len(ids) >= limit:
+            break
+    connection.close()
+    if not ids:
+        raise SystemExit('there are no %s; fill the database first (benchmarks/generate.py)' % collection)
+    return ids
+
+def getJson(url, path):
+    try:
+        client = Client(url, 10)
+        status, data = client.request('GET', path)
+        client.close()
+        return json.loads(data) if status == 200 else None
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+
+def percentile(values, share):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))] * 1000
+
+def summary(latencies, errors, seconds):
+    count = len(latencies)
+    return {
+        'requests': count,
+        'throughput': count / seconds,
+        'errors': errors,
+        'error_rate': errors / count if count else 0.0,
+        'p50_ms': percentile(latencies, 0.5),
+        'p90_ms': percentile(latencies, 0.9),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': max(latencies) * 1000 if latencies else None
+    }
+
+# run the mix with this many clients for this long; each client sends its next request as soon as it has an answer
+def runStep(url, ids, concurrency, seconds, timeout, seed):
+    names = [name for name, weight, make in MIX]
+    weights = [weight for name, weight, make in MIX]
+    makers = dict((name, make) for name, weight, make in MIX)
+    results = {name: ([], [0]) for name in names}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def work(number):
+        rng = random.Random('%s-%d-%d' % (seed, concurrency, number))
+        client = Client(url, timeout)
+        latencies = {name: [] for name in names}
+        errors = {name: 0 for name in names}
+        while time.monotonic() < stop:
+            name = rng.choices(names, weights)[0]
+            method, path, form = makers[name](rng, ids)
+            started = time.perf_counter()
+            try:
+                status, data = client.request(method, path, form)
+                failed = status >= 400
+            except (OSError, http.client.HTTPException):
+                failed = True
+            latencies[name].append(time.perf_counter() - started)
+            errors[name] += failed
+        client.close()
+        with lock:
+            for name in names:
+                results[name][0].extend(latencies[name])
+                results[name][1][0] += errors[name]
+
+    threads = [threading.Thread(target = work, args = (number,)) for number in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    step = summary([value for latencies, errors in results.values() for value in latencies],
+        sum(errors[0] for latencies, errors in results.values()), elapsed)
+    step['concurrency'] = concurrency
+    step['seconds'] = elapsed
+    step['routes'] = {name: summary(latencies, errors[0], elapsed) for name, (latencies, errors) in results.items()}
+    return step
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd = ROOT, stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Load the app with a weighted mix of requests at growing concurrency.')
+    parser.add_argument('--url', help = 'A running server to load; by default one is started.')
+    parser.add_argument('--concurrency', default = '1,2,4,8,16,32', help = 'Concurrent clients of each step, comma separated.')
+    parser.add_argument('--seconds', type = float, default = 10, help = 'Length of each step.')
+    parser.add_argument('--timeout', type = float, default = 30, help = 'Seconds before a request counts as failed.')
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--output', help = 'Write the report here instead of to standard output.')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        port = freePort()
+        server = startServer(port)
+        url = 'http://127.0.0.1:%d' % port
+    try:
+        ids = {'venues': knownIds(url, 'venues'), 'artists': knownIds(url, 'artists')}
+        steps = []
+        for concurrency in (int(value) for value in args.concurrency.split(',')):
+            step = runStep(url, ids, concurrency, args.seconds, args.timeout, args.seed)
+            # how the connection pool of the server coped (one process; None when the server has no such page)
+            step['pool'] = getJson(url, '/pool/stats')
+            steps.append(step)
+            print('%4d clients %8.1f req/s  p50 %7.1f ms  p99 %7.1f ms  errors %.2f%%' % (concurrency, step['throughput'],
+                step['p50_ms'] or 0, step['p99_ms'] or 0, step['error_rate'] * 100), file = sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'commit': commit(),
+        'target': args.url or 'flask run (threaded)',
+        'mix': {name: weight for name, weight, make in MIX},
+        'seconds_per_step': args.seconds,
+        'steps': steps
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Compare validating venue records through VenueForm (one form per record, as the create/edit handlers do)
+# with the validation module, one record at a time and in batches.
+#
+#   python benchmarks/validation_bench.py [number of records]
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm
+from enums import Genre, States
+from validation import validateRecord, validateBatch
+
+# a reproducible mix of valid and invalid venues
+def makeRecords(count, seed = 1):
+    random.seed(seed)
+    states = [name for name, value in States.choices()]
+    genres = [name for name, value in Genre.choices()]
+    phones = ['415-555-0100', '(415) 555-0100', '415.555.0100', '', '555-0100']
+    links = ['https://www.facebook.com/venue%d' % i for i in range(50)] + ['', 'not a link']
+    return [{
+        'name': 'Venue %d' % i,
+        'city': random.choice(['San Francisco', 'New York', 'Austin', '']),
+        'state': random.choice(states),
+        'address': '%d Main St' % i,
+        'phone': random.choice(phones),
+        'genres': random.sample(genres, random.randint(1, 3)),
+        'facebook_link': random.choice(links)
+    } for i in range(count)]
+
+def byForm(records):
+    return [VenueForm(MultiDict([(key, item) for key, value in record.items()
+        for item in (value if isinstance(value, list) else [value])])).validate() for record in records]
+
+def byRecord(records):
+    return [not validateRecord('venues', record) for record in records]
+
+def byBatch(records):
+    return [not errors for errors in validateBatch('venues', records)]
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    records = makeRecords(count)
+    expected = byForm(records)
+    assert byRecord(records) == expected and byBatch(records) == expected, 'the paths disagree'
+    print('%d records, %d valid' % (count, sum(expected)))
+    baseline = None
+    for name, validate in (('form', byForm), ('record', byRecord), ('batch', byBatch)):
+        seconds = min(timeit.repeat(lambda: validate(records), number = 1, repeat = 5))
+        baseline = baseline or seconds
+        print('%-7s %8.1f ms %10.0f records/s %6.1fx' % (name, seconds * 1000, count / seconds, baseline / seconds))
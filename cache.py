@@ -0,0 +1,253 @@
+import hashlib
+import pickle
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from start import app
+
+# returned by a backend when it does not have a value for a key
+MISSING = object()
+
+# in-process cache that drops the least recently used entry when it is full, and entries older than their ttl
+class LRUCache:
+    def __init__(self, maxSize = 1024, ttl = 60):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'entries': len(self.entries),
+            'max_entries': self.maxSize,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+# cache shared by all the processes of a node, kept by a memcached listening on a local socket
+# (a unix socket path or host:port); any socket error counts as a miss, so the pages still work without it
+class SocketCache:
+    def __init__(self, address, ttl = 60, timeout = 0.25):
+        self.address = address
+        self.ttl = ttl
+        self.timeout = timeout
+        self.local = threading.local()
+        self.errors = 0
+
+    def connect(self):
+        if ':' in self.address:
+            host, port = self.address.rsplit(':', 1)
+            connection = socket.create_connection((host, int(port)), self.timeout)
+        else:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.address)
+        return connection, connection.makefile('rb')
+
+    # send one command and read its reply with the given function; reconnect next time if anything goes wrong
+    def call(self, command, readReply, default):
+        try:
+            if getattr(self.local, 'connection', None) is None:
+                self.local.connection, self.local.reader = self.connect()
+            self.local.connection.sendall(command)
+            return readReply(self.local.reader)
+        except (OSError, ValueError):
+            self.errors += 1
+            if getattr(self.local, 'connection', None) is not None:
+                self.local.connection.close()
+            self.local.connection = None
+            return default
+
+    def get(self, key):
+        def readReply(reader):
+            line = reader.readline()
+            if line.startswith(b'VALUE'):
+                size = int(line.split()[3])
+                data = reader.read(size + 2)[:-2]
+                reader.readline()
+                return pickle.loads(data)
+            if line != b'END\r\n':
+                raise ValueError(line)
+            return MISSING
+        return self.call(b'get ' + key.encode() + b'\r\n', readReply, MISSING)
+
+    def set(self, key, value, ttl = None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        header = 'set %s 0 %d %d\r\n' % (key, self.ttl if ttl is None else ttl, len(data))
+        self.call(header.encode() + data + b'\r\n', lambda reader: reader.readline(), None)
+
+    # the connections are per thread; after a fork they belong to the parent
+    def afterFork(self):
+        self.local = threading.local()
+
+    def delete(self, key):
+        self.call(b'delete ' + key.encode() + b'\r\n', lambda reader: reader.readline(), None)
+
+    def stats(self):
+        def readReply(reader):
+            values = {}
+            for line in iter(reader.readline, b'END\r\n'):
+                if not line:
+                    raise ValueError('connection closed')
+                parts = line.decode().split()
+                if len(parts) == 3 and parts[0] == 'STAT':
+                    values[parts[1]] = parts[2]
+            return values
+        values = self.call(b'stats\r\n', readReply, {})
+        return {
+            'backend': 'socket',
+            'address': self.address,
+            'entries': int(values.get('curr_items', 0)),
+            'evictions': int(values.get('evictions', 0)),
+            'expirations': int(values.get('expired_unfetched', 0)),
+            'errors': self.errors
+        }
+
+# cache for the data the pages are rendered from, keyed by namespace ('venue', 'artist', 'venues', 'artists',
+# 'shows') and the entity id or page; a namespace can be dropped at once by moving it to a new generation
+class PageCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.shared = isinstance(backend, SocketCache)
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # generation numbers start from the clock, so a generation that is lost (for example evicted from
+    # the socket cache, or gone with a restart) comes back newer than any entry made with the old one
+    def generation(self, namespace):
+        if self.shared:
+            generation = self.backend.get('generation:' + namespace)
+        else:
+            generation = self.generations.get(namespace, MISSING)
+        if generation is MISSING:
+            generation = time.time_ns()
+            self.setGeneration(namespace, generation)
+        return generation
+
+    # the socket cache shares the generations between processes; the memory cache keeps them in this process
+    def setGeneration(self, namespace, generation):
+        if self.shared:
+            self.backend.set('generation:' + namespace, generation, 0)
+        else:
+            self.generations[namespace] = generation
+
+    def key(self, namespace, parts):
+        raw = repr((namespace, self.generation(namespace), parts))
+        return namespace + ':' + hashlib.sha1(raw.encode()).hexdigest()
+
+    # get the cached value, or build it, cache it and return it; None is returned but not cached
+    def fetch(self, namespace, parts, build, ttl = None):
+        return self.fetchVersioned(namespace, parts, build, ttl)[0]
+
+    # like fetch, but also gives the version of the value: an id made when it was built, which changes whenever
+    # the value is built again (after it is invalidated or expires), so anything made from it can be keyed on it
+    def fetchVersioned(self, namespace, parts, build, ttl = None):
+        key = self.key(namespace, parts)
+        entry = self.lookup(key)
+        if entry is not MISSING:
+            version, value = entry
+            return value, version
+        return self.store(key, build(), ttl)
+
+    # the same with a build that is a coroutine function (the async pages)
+    async def fetchVersionedAsync(self, namespace, parts, build, ttl = None):
+        key = self.key(namespace, parts)
+        entry = self.lookup(key)
+        if entry is not MISSING:
+            version, value = entry
+            return value, version
+        return self.store(key, await build(), ttl)
+
+    # build the value again and cache it in place of the entry there, which may be older than the data
+    def refresh(self, namespace, parts, build, ttl = None):
+        return self.store(self.key(namespace, parts), build(), ttl)
+
+    # the (version, value) entry of a key, counted as a hit or a miss
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        with self.lock:
+            if entry is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    # cache a value that was just built under a new version; gives the value and its version
+    def store(self, key, value, ttl = None):
+        if value is None:
+            return None, None
+        version = uuid.uuid4().hex
+        self.backend.set(key, (version, value), ttl)
+        return value, version
+
+    # drop the entry of one entity or page
+    def invalidate(self, namespace, *parts):
+        self.backend.delete(self.key(namespace, parts))
+
+    # drop every entry of a namespace
+    def invalidateAll(self, namespace):
+        with self.lock:
+            self.setGeneration(namespace, max(time.time_ns(), self.generation(namespace) + 1))
+
+    def afterFork(self):
+        if self.shared:
+            self.backend.afterFork()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+# make the backend chosen in the config
+def createCache(config):
+    if config['CACHE_BACKEND'] == 'socket':
+        backend = SocketCache(config['CACHE_SOCKET'], config['CACHE_TTL'])
+    else:
+        backend = LRUCache(config['CACHE_MAX_ENTRIES'], config['CACHE_TTL'])
+    return PageCache(backend)
+
+pageCache = createCache(app.config)
+
+# the shows listing is the one cached page whose key does not carry its validators, so it is dropped by hand
+# after a committed write it shows: a show added, or a venue or artist edited or deleted. The venue and artist
+# pages and their listings need nothing, as their keys change with the rows they are made from
+def showsChanged():
+    pageCache.invalidateAll('shows')
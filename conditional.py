@@ -0,0 +1,98 @@
+import hashlib
+import os
+from datetime import datetime
+from flask import g, request
+from werkzeug.http import is_resource_modified
+from start import db
+from asyncdb import fetchAll
+import assets
+
+# Conditional GETs of the HTML pages. A view marked with @conditionalGet(query) has a weak ETag and a Last-Modified
+# made from one small query (see the validator queries of queries.py), run before the view; when the browser or
+# CDN already has that version of the page the view is skipped and 304 Not Modified is sent instead. The pages
+# get the Cache-Control of their endpoint from CACHE_CONTROL. A client with a session cookie (a flashed
+# message to show) is always sent the whole page, privately. The views key the page data they cache on the
+# ETag (pageTag), so a page is never sent with validators newer than its data.
+
+# let a view be validated with a query made from its arguments; goes under the route decorator:
+#
+#   @app.route('/venues/<int:venue_id>')
+#   @conditionalGet(venueValidatorsQuery)
+#   def show_venue(venue_id):
+def conditionalGet(query):
+    def declare(view):
+        view.validators = query
+        return view
+    return declare
+
+# a digest of the templates and assets, in the tags so that a deploy that changes how pages look changes them too
+release = None
+
+def digestRelease(app):
+    digest = hashlib.sha1()
+    for folder, dirs, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        dirs.sort()
+        for name in sorted(files):
+            with open(os.path.join(folder, name), 'rb') as file:
+                digest.update(file.read())
+    digest.update(repr(sorted(assets.manifest.items())).encode())
+    return digest.hexdigest()
+
+def applies(view):
+    return request.method in ('GET', 'HEAD') and getattr(view, 'validators', None) is not None
+
+# a client with a session cookie has a flashed message to see, on a page that must not be kept or revalidated
+def isPrivate(app):
+    return app.config['SESSION_COOKIE_NAME'] in request.cookies
+
+# note the validators of the request from the row of its query; the 304 response if the client has that version
+def validate(app, row):
+    if row is None:
+        return None
+    # an empty table has no times to go by, so its pages go out with an ETag alone
+    lastModified = max((value for value in row if isinstance(value, datetime)), default = None)
+    tag = hashlib.sha1(repr((release, tuple(row))).encode()).hexdigest()
+    g.validators = tag, lastModified
+    if isPrivate(app) or is_resource_modified(request.environ, etag = tag, last_modified = lastModified):
+        return None
+    return addHeaders(app, app.response_class(status = 304))
+
+# the tag of the page of the request (None without validators), which the views put in their page cache keys:
+# the data of a page is built again whenever its validators change, in every process, so a page never goes
+# out with newer validators than its data
+def pageTag():
+    validators = g.get('validators')
+    return validators[0] if validators else None
+
+def addHeaders(app, response):
+    tag, lastModified = g.validators
+    response.set_etag(tag, weak = True)
+    if lastModified is not None:
+        response.last_modified = lastModified
+    response.headers['Cache-Control'] = app.config['CACHE_CONTROL'].get(request.endpoint, 'no-cache')
+    return response
+
+def beforeRequest(app):
+    view = app.view_functions.get(request.endpoint)
+    # the async pages (asgi.py) run their query on the event loop, with beforeRequestAsync
+    if g.get('asyncView') is None and applies(view):
+        return validate(app, db.session.execute(view.validators(**request.view_args)).first())
+
+async def beforeRequestAsync(app, view):
+    if applies(view):
+        rows = await fetchAll(view.validators(**request.view_args))
+        return validate(app, rows[0] if rows else None)
+
+def afterRequest(app, response):
+    if g.get('validators') is not None and response.status_code == 200:
+        if isPrivate(app):
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            addHeaders(app, response)
+    return response
+
+def init(app):
+    global release
+    release = digestRelease(app)
+    app.before_request(lambda: beforeRequest(app))
+    app.after_request(lambda response: afterRequest(app, response))
@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, select, update, insert, func, case, or_
+from sqlalchemy.orm import Session
+from start import db
+from models import Venue, Artist, Show, ShowCounterWatermark
+
+# The listings and searches read the upcoming and past shows of venues and artists from counter columns instead
+# of counting shows. The counters split shows at a watermark rather than at "now": a show starting at or after
+# it is upcoming. Every write to shows adjusts the counters of its venue and artist; roll-counters moves the
+# watermark on (every COUNTER_ROLL_INTERVAL seconds with --loop, as one process next to the web server, or from
+# cron), moving the shows it passes from upcoming to past, so the counts are that far behind the clock at
+# most; rebuild-counters counts everything again.
+
+# the entities with counters, and the column of shows that points at each
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def utc(value):
+    return value.replace(tzinfo = timezone.utc) if value.tzinfo is None else value
+
+# the watermark, locked until the end of the transaction: shared by writes to shows, so that they can go on
+# together, and exclusive for the roll-forward and rebuild, so that no write classifies a show against a
+# watermark that is being moved (SQLite has no row locks, but lets one transaction write at a time anyway);
+# the counters are built from scratch the first time, when there is no watermark yet
+def lockWatermark(connection, exclusive = False):
+    query = select(ShowCounterWatermark.rolled_until).where(ShowCounterWatermark.id == 1).with_for_update(read = not exclusive)
+    rolledUntil = connection.execute(query).scalar()
+    if rolledUntil is None:
+        return rebuild(connection)
+    return rolledUntil
+
+# add to the counters of some entities, {id: amount} for each counter, in one statement
+def addToCounters(connection, model, upcoming, past):
+    ids = set(id for id, amount in upcoming.items() if amount) | set(id for id, amount in past.items() if amount)
+    if not ids:
+        return
+    def plus(counts):
+        return case(counts, value = model.id, else_ = 0) if counts else 0
+    connection.execute(update(model).where(model.id.in_(ids)).values(
+        upcoming_shows_count = model.upcoming_shows_count + plus(upcoming),
+        past_shows_count = model.past_shows_count + plus(past)
+    ))
+
+# count shows that were added (+1) or removed (-1): a list of (venue id, artist id, start time, +1 or -1)
+def countShows(connection, changes):
+    if not changes:
+        return
+    rolledUntil = lockWatermark(connection)
+    for position, (model, key) in enumerate(COUNTED):
+        upcoming = Counter()
+        past = Counter()
+        for change in changes:
+            id, startTime, amount = change[position], change[2], change[3]
+            if id is not None:
+                (upcoming if utc(startTime) >= rolledUntil else past)[id] += amount
+        addToCounters(connection, model, upcoming, past)
+
+# take the shows matching some conditions off the counters, before they are deleted without the ORM (as a
+# batch, or by the cascade of a venue delete), counting them in the database instead of loading them
+def uncountShows(connection, *conditions):
+    rolledUntil = lockWatermark(connection)
+    for model, key in COUNTED:
+        counts = connection.execute(select(key, func.count(Show.id).filter(Show.start_time >= rolledUntil),
+            func.count(Show.id).filter(Show.start_time < rolledUntil)).where(*conditions).where(key.isnot(None)).group_by(key)).all()
+        addToCounters(connection, model, {id: -upcoming for id, upcoming, past in counts}, {id: -past for id, upcoming, past in counts})
+
+# the shows a flush inserts or deletes (created with a form or imported, or deleted with their venue) are
+# counted in the same transaction; shows are never edited
+def afterFlush(session, context):
+    changes = [(show.venue_id, show.artist_id, show.start_time, 1) for show in session.new if isinstance(show, Show)]
+    changes += [(show.venue_id, show.artist_id, show.start_time, -1) for show in session.deleted if isinstance(show, Show)]
+    countShows(session.connection(), changes)
+
+event.listen(Session, 'after_flush', afterFlush)
+
+# the shows of a venue the session deletes that it has not loaded go with the venue, by the database's cascade;
+# a flush deletes the loaded ones (which afterFlush counts) before the venue, so the rest are counted here
+def beforeVenueDelete(mapper, connection, venue):
+    uncountShows(connection, Show.venue_id == venue.id)
+
+event.listen(Venue, 'before_delete', beforeVenueDelete)
+
+# move the watermark to now, moving the shows that started since it from upcoming to past; gives their number
+def rollForward(connection, now = None):
+    now = now or datetime.now(timezone.utc)
+    rolledUntil = lockWatermark(connection, exclusive = True)
+    if now <= rolledUntil:
+        return 0
+    passed = (Show.start_time >= rolledUntil, Show.start_time < now)
+    for model, key in COUNTED:
+        started = dict(connection.execute(select(key, func.count(Show.id)).where(*passed).where(key.isnot(None)).group_by(key)).all())
+        addToCounters(connection, model, {id: -count for id, count in started.items()}, started)
+    moved = connection.execute(select(func.count(Show.id)).where(*passed)).scalar()
+    connection.execute(update(ShowCounterWatermark).where(ShowCounterWatermark.id == 1).values(rolled_until = now))
+    return moved
+
+# roll forward in a transaction of its own; gives the number of shows moved. The counters are updated with the
+# rows' updated_at, so the pages that showed the moved shows as upcoming change validators and are built again
+def rollCounters(now = None):
+    with db.engine.begin() as connection:
+        return rollForward(connection, now)
+
+# the counts of shows of each entity on either side of a time, as correlated subqueries
+def countedShows(model, key, rolledUntil):
+    upcoming = select(func.count(Show.id)).where(key == model.id).where(Show.start_time >= rolledUntil).scalar_subquery()
+    past = select(func.count(Show.id)).where(key == model.id).where(Show.start_time < rolledUntil).scalar_subquery()
+    return upcoming, past
+
+# count every show again and put the watermark at now; gives the new watermark
+def rebuild(connection, now = None):
+    now = now or datetime.now(timezone.utc)
+    connection.execute(select(ShowCounterWatermark.id).with_for_update())
+    for model, key in COUNTED:
+        upcoming, past = countedShows(model, key, now)
+        connection.execute(update(model).values(upcoming_shows_count = upcoming, past_shows_count = past))
+    watermark = update(ShowCounterWatermark).where(ShowCounterWatermark.id == 1).values(rolled_until = now)
+    if connection.execute(watermark).rowcount == 0:
+        connection.execute(insert(ShowCounterWatermark).values(id = 1, rolled_until = now))
+    return now
+
+# the entities whose counters differ from a count of their shows at the watermark: (model, id, stored, counted)
+def findDrift(connection):
+    rolledUntil = lockWatermark(connection)
+    drift = []
+    for model, key in COUNTED:
+        upcoming, past = countedShows(model, key, rolledUntil)
+        rows = connection.execute(select(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past)
+            .where(or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past))
+            .order_by(model.id)).all()
+        drift += [(model, row[0], (row[1], row[2]), (row[3], row[4])) for row in rows]
+    return drift
+
+# roll the counters forward every interval seconds, on a thread of this process (start) or in the foreground (run)
+class RollForwardJob:
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+
+    def start(self):
+        self.stopped = threading.Event()
+        threading.Thread(target = self.run, args = (self.stopped,), name = 'counter-roll', daemon = True).start()
+
+    def run(self, stopped):
+        while not stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    rollCounters()
+            except Exception:
+                self.app.logger.exception('Error rolling the show counters forward')
+
+@click.command('rebuild-counters')
+@with_appcontext
+@click.option('--check', is_flag = True, help = 'Only report the counters that are wrong, and exit with 1 if any are.')
+def rebuildCountersCommand(check):
+    '''Count the upcoming and past shows of every venue and artist again.'''
+    with db.engine.begin() as connection:
+        if not check:
+            click.echo('Counters rebuilt as of %s.' % rebuild(connection).isoformat())
+            return
+        drift = findDrift(connection)
+    for model, id, stored, counted in drift:
+        click.echo('%s %d: %d upcoming and %d past, counted %d and %d' % ((model.__tablename__, id) + stored + counted))
+    click.echo('%d counters are wrong.' % len(drift), err = True)
+    if drift:
+        raise SystemExit(1)
+
+@click.command('roll-counters')
+@with_appcontext
+@click.option('--loop', is_flag = True, help = 'Keep rolling every COUNTER_ROLL_INTERVAL seconds until stopped.')
+def rollCountersCommand(loop):
+    '''Move the shows that have started since the last roll from upcoming to past.'''
+    if loop:
+        app = current_app._get_current_object()
+        click.echo('Rolling the show counters every %g seconds.' % app.config['COUNTER_ROLL_INTERVAL'])
+        RollForwardJob(app, app.config['COUNTER_ROLL_INTERVAL']).run(threading.Event())
+        return
+    click.echo('%d shows moved to past.' % rollCounters())
+
+# the development server (python app.py) is the only process, so it rolls the counters itself; with the
+# reloader, only in the child process that serves
+def startWithDevServer(app):
+    if app.config['COUNTER_ROLL_INTERVAL'] > 0 and (not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        RollForwardJob(app, app.config['COUNTER_ROLL_INTERVAL']).start()
+
+def init(app):
+    app.cli.add_command(rebuildCountersCommand)
+    app.cli.add_command(rollCountersCommand)
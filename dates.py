@@ -0,0 +1,47 @@
+import functools
+from datetime import datetime, timezone
+import dateutil.parser
+from babel import Locale
+from babel.dates import parse_pattern
+
+# the named formats of the datetime filter; anything else is taken as a Babel pattern
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+# formatted datetimes kept for reuse; a page of shows repeats the same few start times a lot
+MEMO_SIZE = 4096
+
+# patterns and locales are parsed once instead of on every call to babel.dates.format_datetime
+@functools.lru_cache(maxsize = None)
+def patternOf(format):
+    return parse_pattern(FORMATS.get(format, format))
+
+@functools.lru_cache(maxsize = None)
+def localeOf(locale):
+    return Locale.parse(locale)
+
+# the offset is part of the key: the same instant in two zones shows a different wall time
+@functools.lru_cache(maxsize = MEMO_SIZE)
+def formatMemo(value, offset, format, locale):
+    return patternOf(format).apply(value, localeOf(locale))
+
+# like babel.dates.format_datetime(value, format, locale = locale): times without a zone are taken as UTC
+# and the wall time of the value is shown; start times come as datetimes, but strings are still accepted
+def formatDatetime(value, format = 'medium', locale = 'en'):
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo = timezone.utc)
+    return formatMemo(value, value.utcoffset(), format, locale)
+
+# format the start times of many shows at once, each distinct time only once; gives the text by start time,
+# for a view to hand to its template
+def formatStartTimes(shows, format = 'full', locale = 'en'):
+    texts = {}
+    for show in shows:
+        value = show['start_time']
+        if value not in texts:
+            texts[value] = formatDatetime(value, format, locale)
+    return texts
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# upper bounds (in seconds) of the buckets of the checkout wait-time histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# what a pool has been doing: how long checkouts waited for a connection and how many timed out
+class PoolStats:
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.pool = None
+        self.buckets = [0] * len(WAIT_BUCKETS)
+        self.waitCount = 0
+        self.waitSum = 0.0
+        self.timeouts = 0
+
+    def recordWait(self, seconds):
+        with self.lock:
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+            self.waitCount += 1
+            self.waitSum += seconds
+
+    def recordTimeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        pool = self.pool
+        with self.lock:
+            return {
+                'name': self.name,
+                'size': pool.size() if pool else 0,
+                'checked_out': pool.checkedout() if pool else 0,
+                'checked_in': pool.checkedin() if pool else 0,
+                'overflow': max(pool.overflow(), 0) if pool else 0,
+                'timeouts': self.timeouts,
+                'wait_seconds': {
+                    'buckets': [['+Inf' if bound == float('inf') else bound, count] for bound, count in zip(WAIT_BUCKETS, self.buckets)],
+                    'count': self.waitCount,
+                    'sum': self.waitSum
+                }
+            }
+
+# every instrumented pool of this process by name
+pools = {}
+
+# a QueuePool that times how long each checkout waits for a connection
+class InstrumentedQueuePool(QueuePool):
+    stats = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.recordTimeout()
+            raise
+        self.stats.recordWait(time.perf_counter() - started)
+        return connection
+
+# a pool class with its own stats; the pool is remade with the same class after a dispose, so the stats carry over
+# (base is the pool to instrument: QueuePool, or AsyncAdaptedQueuePool for an async engine)
+def instrumentedPoolClass(name, base = QueuePool):
+    stats = pools.setdefault(name, PoolStats(name))
+    bases = (InstrumentedQueuePool,) if base is QueuePool else (InstrumentedQueuePool, base)
+    return type('InstrumentedQueuePool', bases, {'stats': stats})
+
+def isTrue(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+# the engine options for a database url from the DB_* settings of the config
+def engineOptions(config, uri, name = 'primary', poolBase = QueuePool):
+    # SQLite in memory cannot have a pool of connections; Flask-SQLAlchemy sets it up itself
+    if uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri):
+        return {}
+    options = {
+        'poolclass': instrumentedPoolClass(name, poolBase),
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_pre_ping': isTrue(config['DB_POOL_PRE_PING'])
+    }
+    # PostgreSQL cancels any statement that runs longer than this many milliseconds
+    statementTimeout = int(config['DB_STATEMENT_TIMEOUT'])
+    if statementTimeout and uri.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statementTimeout)}}
+    elif statementTimeout and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % statementTimeout}
+    return options
+
+# the stats of every pool of this process
+def poolStats():
+    return [stats.snapshot() for stats in pools.values()]
+
+# SQLite only enforces foreign keys, and so deletes the shows of a deleted venue, on connections that ask for it
+@event.listens_for(Engine, 'connect')
+def enableForeignKeys(connection, record):
+    if isinstance(connection, sqlite3.Connection):
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
@@ -0,0 +1,70 @@
+import threading
+from sqlalchemy import select, delete, func
+from start import db
+from models import Venue, Show
+from counters import uncountShows
+from cache import showsChanged
+from search import indexes as searchIndexes
+
+# A venue is deleted with one DELETE; the database deletes its shows with it (ON DELETE CASCADE), without
+# loading them. The counters of their artists are taken down first, in the same transaction. A venue with so
+# many shows that deleting them at once would hold its locks for long is deleted in the background instead,
+# a batch of shows per transaction, and the venue itself last.
+
+# venues being deleted in the background by this process
+deleting = set()
+deletingLock = threading.Lock()
+
+def countVenueShows(venueId):
+    return db.session.execute(select(func.count(Show.id)).where(Show.venue_id == venueId)).scalar()
+
+# the statements skip the ORM, so what it would have done on a delete is done here
+def venueDeleted(venueId):
+    showsChanged()
+    searchIndexes[Venue].invalidate()
+
+# take the shows of a venue off the counters and delete it (the cascade deletes them) in the transaction of a
+# connection; False if there is no such venue. The venue row is locked first: adding a show locks the venue
+# it points at, so none can be added between the count and the delete and go uncounted
+def uncountAndDelete(connection, venueId):
+    connection.execute(select(Venue.id).where(Venue.id == venueId).with_for_update())
+    uncountShows(connection, Show.venue_id == venueId)
+    return connection.execute(delete(Venue).where(Venue.id == venueId)).rowcount > 0
+
+# delete a venue and its shows in the transaction of the session; False if there is no such venue
+def deleteVenue(venueId):
+    return uncountAndDelete(db.session.connection(), venueId)
+
+# delete the shows of a venue batchSize at a time, each batch in a transaction of its own, then the venue
+# with the shows added since the last batch
+def deleteVenueInBatches(venueId, batchSize):
+    while True:
+        with db.engine.begin() as connection:
+            ids = connection.execute(select(Show.id).where(Show.venue_id == venueId).limit(batchSize)).scalars().all()
+            if not ids:
+                break
+            uncountShows(connection, Show.id.in_(ids))
+            connection.execute(delete(Show).where(Show.id.in_(ids)))
+    with db.engine.begin() as connection:
+        uncountAndDelete(connection, venueId)
+
+# start deleting a venue in the background; False if this process is deleting it already
+def deleteVenueInBackground(app, venueId):
+    with deletingLock:
+        if venueId in deleting:
+            return False
+        deleting.add(venueId)
+
+    def run():
+        try:
+            with app.app_context():
+                deleteVenueInBatches(venueId, app.config['VENUE_DELETE_BATCH_SIZE'])
+                venueDeleted(venueId)
+        except Exception:
+            app.logger.exception('Error deleting venue %d in the background', venueId)
+        finally:
+            with deletingLock:
+                deleting.discard(venueId)
+
+    threading.Thread(target = run, name = 'delete-venue-%d' % venueId, daemon = True).start()
+    return True
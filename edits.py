@@ -0,0 +1,72 @@
+from sqlalchemy import select, update, or_
+from start import db
+from search import markIndexDirty
+
+# An edit form carries the version of the venue or artist it was filled from. Saving it is one UPDATE of the
+# columns the form sets that matches that version alone, so an edit made from a form that someone else has
+# saved over since is caught instead of overwriting their changes. Nothing is loaded unless it matches no row.
+
+# the column each field of an edit form sets
+VENUE_FIELDS = {
+    'name': 'name',
+    'city': 'city',
+    'state': 'state',
+    'address': 'address',
+    'phone': 'phone',
+    'image_link': 'image_link',
+    'facebook_link': 'facebook_link',
+    'genres': 'genres',
+    'website_link': 'website',
+    'seeking_talent': 'seeking_talent',
+    'seeking_description': 'seeking_description'
+}
+
+ARTIST_FIELDS = {
+    'name': 'name',
+    'city': 'city',
+    'state': 'state',
+    'phone': 'phone',
+    'image_link': 'image_link',
+    'facebook_link': 'facebook_link',
+    'genres': 'genres',
+    'website_link': 'website',
+    'seeking_venue': 'seeking_venue',
+    'seeking_description': 'seeking_description'
+}
+
+# the entity was saved by someone else after the form was filled; version is the one it is at now
+class StaleEdit(Exception):
+    def __init__(self, version):
+        super().__init__(version)
+        self.version = version
+
+# the values of the columns a form sets, by column
+def formValues(form, fields):
+    return {column: getattr(form, field).data for field, column in fields.items()}
+
+# save an edit made from a version of an entity (None to save over any version) in the transaction of the
+# session; gives the version it is at now, or None if there is no such entity. The UPDATE matches only a row
+# that some of the values would change, so an edit that changes nothing leaves the version alone
+def saveEdit(model, id, version, values):
+    matches = [model.id == id, or_(*[getattr(model, name).is_distinct_from(value) for name, value in values.items()])]
+    if version is not None:
+        matches.append(model.version == version)
+    statement = (update(model).where(*matches)
+        .values(version = model.version + 1, **values)
+        .returning(model.version)
+        .execution_options(synchronize_session = False))
+    saved = db.session.execute(statement).scalar()
+    if saved is not None:
+        if 'name' in values:
+            markIndexDirty(db.session, model)
+        return saved
+    # nothing matched: the entity is gone, at another version, or already holds the values
+    current = db.session.execute(select(model.version).where(model.id == id)).scalar()
+    if current is not None and version is not None and version != current:
+        raise StaleEdit(current)
+    return current
+
+# point a form at the version an entity is at now, so that saving it again overwrites the edit it ran into
+def rebaseForm(form, version):
+    form.version.data = version
+    form.version.raw_data = None
@@ -1,4 +1,10 @@
 import enum
+import functools
+
+# the (name, value) pairs of an enum for a select field, built once per enum and shared by every field
+@functools.lru_cache(maxsize=None)
+def choicesOf(cls):
+    return [(choice.name, choice.value) for choice in cls]
 
 class Genre(enum.Enum):
     Alternative = 'Alternative'
@@ -23,7 +29,7 @@ class Genre(enum.Enum):
 
     @classmethod
     def choices(cls):
-        return [(choice.name, choice.value) for choice in cls]
+        return choicesOf(cls)
 
 class States(enum.Enum):
     AL = 'AL'
@@ -80,4 +86,4 @@ class States(enum.Enum):
 
     @classmethod
     def choices(cls):
-        return [(choice.name, choice.value) for choice in cls]
+        return choicesOf(cls)
@@ -1,14 +1,20 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Optional
+from wtforms.widgets import HiddenInput
 from enums import Genre, States
-import re
-import validators
+from validation import checkContactFields
 
 class Meta:
     csrf = False
 
+# put error messages from the validation module on the fields of a form; true if there were none
+def addErrors(form, errors):
+    for name, messages in errors.items():
+        getattr(form, name).errors.extend(messages)
+    return not errors
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id'
@@ -59,26 +65,14 @@ class VenueForm(Form):
         'seeking_description'
     )
 
-    def validate(self): 
-        def is_valid_phone(number):
-            regex = re.compile('^\([0-9]{3}\) *[0-9]{3}-[0-9]{4}$|^[0-9]{3}-[0-9]{3}-[0-9]{4}$|^[0-9]{3}.[0-9]{3}.[0-9]{4}$|^$')
-            return regex.match(number)
+    # the version of the venue the edit form was filled from (left out by the create form)
+    version = IntegerField( 'version', widget = HiddenInput(), validators = [Optional()] )
 
-        def is_valid_facebook_link(facebookLink):
-            # if valid or empty, count as valid
-            if validators.url(facebookLink) or re.compile('^$').match(facebookLink):
-                return True
-            else: return False
-        
+    def validate(self, extra_validators=None):
         # perform default validation first
-        valid = Form.validate(self)
-        if(valid):
-            if not is_valid_phone(self.phone.data):
-                self.phone.errors.append('Invalid phone.')
-                valid =  False
-            if not is_valid_facebook_link(self.facebook_link.data):
-                self.facebook_link.errors.append('Invalid facebook link.')
-                valid = False
+        valid = Form.validate(self, extra_validators)
+        if (valid):
+            valid = addErrors(self, checkContactFields(self.phone.data, self.facebook_link.data))
         return valid
 
 
@@ -122,24 +116,12 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
-    def validate(self):        
-        def is_valid_phone(number):
-            regex = re.compile('^\([0-9]{3}\) *[0-9]{3}-[0-9]{4}$|^[0-9]{3}-[0-9]{3}-[0-9]{4}$|^[0-9]{3}.[0-9]{3}.[0-9]{4}$|^$')
-            return regex.match(number)
+    # the version of the artist the edit form was filled from (left out by the create form)
+    version = IntegerField( 'version', widget = HiddenInput(), validators = [Optional()] )
 
-        def is_valid_facebook_link(facebookLink):
-            # if valid or empty, count as valid
-            if validators.url(facebookLink) or re.compile('^$').match(facebookLink):
-                return True
-            else: return False
-        
+    def validate(self, extra_validators=None):
         # perform default validation first
-        valid = Form.validate(self)
+        valid = Form.validate(self, extra_validators)
         if (valid):
-            if not is_valid_phone(self.phone.data):
-                self.phone.errors.append('Invalid phone.')
-                valid =  False
-            if not is_valid_facebook_link(self.facebook_link.data):
-                self.facebook_link.errors.append('Invalid facebook link.')
-                valid = False
+            valid = addErrors(self, checkContactFields(self.phone.data, self.facebook_link.data))
         return valid
@@ -0,0 +1,30 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from cache import pageCache
+
+# {% cache key, ttl %} ... {% endcache %}: render the body once and reuse it from the page cache until the
+# ttl (seconds, the CACHE_TTL of the config when left out) runs out. The key is a value or a tuple, usually
+# the entity id and the version of the data the body is made from:
+#
+#   {% cache ('venue-upcoming', venue.id, version) %}
+#
+# A key with None in it (no version because the data could not be loaded) is rendered but never cached.
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle = True)
+        return nodes.CallBlock(self.call_method('renderFragment', args), [], [], body).set_lineno(lineno)
+
+    def renderFragment(self, key, ttl, caller):
+        parts = key if isinstance(key, tuple) else (key,)
+        if None in parts:
+            return caller()
+        return Markup(pageCache.fetch('fragment', parts, lambda: str(caller()), ttl))
@@ -0,0 +1,45 @@
+# Production serving: gunicorn -c gunicorn.conf.py
+#
+# The app is loaded once in the master and the workers are forked from it, so they start at once and share
+# its memory. Each worker has its own connection pool of DB_POOL_SIZE (+ DB_MAX_OVERFLOW) connections, so the
+# database sees up to workers x that many; keep WEB_THREADS within one pool. With several workers, set
+# METRICS_DIR so that /metrics adds up all of them.
+#
+# Reloading: kill -HUP <master> starts new workers with the new settings and stops the old ones once they have
+# answered their requests. The code is loaded in the master, so new code needs a new master: kill -USR2 <master>
+# starts one next to the old, then kill -QUIT <old master> lets the old one finish and leave.
+
+import multiprocessing
+import os
+
+# production defaults, before the app (and its config) is loaded
+os.environ.setdefault('DEBUG', 'false')
+
+wsgi_app = 'start:loadRoutes()'
+bind = os.environ.get('BIND', '0.0.0.0:3000')
+
+# processes, and threads in each; by default two workers per core (and one more)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+# seconds a request may take before its worker is restarted, and that a worker gets to finish on a reload
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# restart a worker after this many requests (give or take a tenth, so they do not all restart together)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+def post_fork(server, worker):
+    from start import afterFork
+    afterFork()
+
+# the worker's metrics file goes into the totals of the exited workers (metrics.py); runs in the master
+def child_exit(server, worker):
+    from start import app
+    import metrics
+    if app.config['METRICS_DIR']:
+        metrics.retireSnapshot(app.config['METRICS_DIR'], worker.pid)
@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from datetime import timezone
+import click
+from flask.cli import with_appcontext
+import dateutil.parser
+from sqlalchemy import insert, select
+from start import db
+from models import Venue, Artist, Show
+from counters import countShows
+from validation import validateBatch
+from cache import pageCache, showsChanged
+
+# BooleanField: everything but a missing value, '' and 'false' is true
+def toBoolean(value):
+    if isinstance(value, str):
+        return value.lower() not in ('', 'false')
+    return bool(value)
+
+# genres come as a list (JSON lines) or as text separated by commas or semicolons (CSV); anything else,
+# or a list of anything but strings, is a ValueError
+def toGenres(value):
+    if value is None:
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        if not value.startswith('['):
+            return [genre.strip() for genre in re.split('[,;]', value) if genre.strip()]
+        value = json.loads(value)
+    if not isinstance(value, list) or not all(isinstance(genre, str) for genre in value):
+        raise ValueError('Not a list of genres')
+    return value
+
+def text(record, name):
+    value = record.get(name)
+    return '' if value is None else str(value)
+
+# turn an input record into the columns of a venue (still to be validated)
+def venueColumns(record):
+    return {
+        'name': text(record, 'name'),
+        'city': text(record, 'city'),
+        'state': text(record, 'state'),
+        'address': text(record, 'address'),
+        'phone': text(record, 'phone'),
+        'image_link': text(record, 'image_link'),
+        'facebook_link': text(record, 'facebook_link'),
+        'genres': toGenres(record.get('genres')),
+        'website': text(record, 'website_link') or text(record, 'website'),
+        'seeking_talent': toBoolean(record.get('seeking_talent')),
+        'seeking_description': text(record, 'seeking_description')
+    }
+
+def artistColumns(record):
+    return {
+        'name': text(record, 'name'),
+        'city': text(record, 'city'),
+        'state': text(record, 'state'),
+        'phone': text(record, 'phone'),
+        'genres': toGenres(record.get('genres')),
+        'image_link': text(record, 'image_link'),
+        'facebook_link': text(record, 'facebook_link'),
+        'website': text(record, 'website_link') or text(record, 'website'),
+        'seeking_venue': toBoolean(record.get('seeking_venue')),
+        'seeking_description': text(record, 'seeking_description')
+    }
+
+# turn the records of a chunk into columns and check them all at once with the rules of the forms;
+# gives the valid (columns, record) pairs and adds the invalid records with their errors to rejects
+def prepareChunk(kind, records, rejects):
+    records = rejectNonObjects(records, rejects)
+    if kind == 'shows':
+        return prepareShows(records, rejects)
+    toColumns = venueColumns if kind == 'venues' else artistColumns
+    rows = []
+    for record in records:
+        try:
+            rows.append(toColumns(record))
+        except ValueError:
+            rows.append(None)
+    prepared = []
+    for record, row, errors in zip(records, rows, validateBatch(kind, [row or {} for row in rows])):
+        if row is None:
+            rejects.append((record, {'genres': ['Not a valid list.']}))
+        elif errors:
+            rejects.append((record, errors))
+        else:
+            prepared.append((row, record))
+    return prepared
+
+# a line of a JSON lines file that is not an object (a list, a string, or not JSON at all) is rejected
+# on its own instead of stopping the import
+def rejectNonObjects(records, rejects):
+    kept = []
+    for record in records:
+        if isinstance(record, dict):
+            kept.append(record)
+        else:
+            rejects.append((record, {'': ['Not a JSON object.']}))
+    return kept
+
+def prepareShows(records, rejects):
+    prepared = []
+    for record in records:
+        row, errors = prepareShow(record)
+        if errors:
+            rejects.append((record, errors))
+        else:
+            prepared.append((row, record))
+    return rejectMissingReferences(prepared, rejects)
+
+def prepareShow(record):
+    errors = {}
+    columns = {}
+    for name in ('venue_id', 'artist_id'):
+        try:
+            columns[name] = int(record.get(name))
+        except (TypeError, ValueError):
+            errors[name] = ['Not a valid integer value.']
+    try:
+        columns['start_time'] = dateutil.parser.parse(text(record, 'start_time'))
+        # times without a zone are taken as UTC, like everywhere else
+        if columns['start_time'].tzinfo is None:
+            columns['start_time'] = columns['start_time'].replace(tzinfo = timezone.utc)
+    except (ValueError, OverflowError):
+        errors['start_time'] = ['Not a valid datetime value.']
+    if errors:
+        return None, errors
+    return columns, None
+
+KINDS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show
+}
+
+# read records one at a time from a .csv file (with a header row) or a .jsonl file; a line that is not
+# valid JSON comes as its text, to be rejected with the rest
+def readRecords(path):
+    with open(path, newline = '') as file:
+        if path.endswith('.csv'):
+            for record in csv.DictReader(file):
+                yield record
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield line.rstrip('\n')
+
+# shows can only point at venues and artists that exist; look them up once per chunk
+def rejectMissingReferences(rows, rejects):
+    venueIds = set(row['venue_id'] for row, record in rows)
+    artistIds = set(row['artist_id'] for row, record in rows)
+    venueIds = set(db.session.execute(select(Venue.id).where(Venue.id.in_(venueIds))).scalars())
+    artistIds = set(db.session.execute(select(Artist.id).where(Artist.id.in_(artistIds))).scalars())
+    kept = []
+    for row, record in rows:
+        errors = {}
+        if row['venue_id'] not in venueIds:
+            errors['venue_id'] = ['No such venue.']
+        if row['artist_id'] not in artistIds:
+            errors['artist_id'] = ['No such artist.']
+        if errors:
+            rejects.append((record, errors))
+        else:
+            kept.append((row, record))
+    return kept
+
+# write the rows of a chunk with one executemany
+def insertRows(model, rows):
+    db.session.execute(insert(model), rows)
+
+# write the rows of a chunk with PostgreSQL COPY, which skips statement parsing altogether
+def copyRows(model, rows):
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copyValue(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (model.__tablename__, ', '.join(columns)), buffer)
+
+# a value as COPY's csv format expects it; lists become array literals
+def copyValue(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+# validate, insert and commit one chunk of records; gives the number of rows inserted
+def importChunk(kind, records, rejects, useCopy):
+    rows = prepareChunk(kind, records, rejects)
+    if not rows:
+        return 0
+    model = KINDS[kind]
+    values = [row for row, record in rows]
+    try:
+        (copyRows if useCopy else insertRows)(model, values)
+        # the rows skip the ORM, so their shows are counted on their venues and artists here
+        if model is Show:
+            countShows(db.session.connection(), [(row['venue_id'], row['artist_id'], row['start_time'], 1) for row in values])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for row, record in rows:
+            rejects.append((record, {'': ['Could not be inserted: ' + type(e).__name__ + '.']}))
+        return 0
+    return len(values)
+
+@click.command('import')
+@with_appcontext
+@click.argument('path', type = click.Path(exists = True, dir_okay = False))
+@click.option('--kind', type = click.Choice(sorted(KINDS)), help = 'What the file holds; taken from the file name when not given.')
+@click.option('--chunk-size', default = 5000, show_default = True, help = 'Rows inserted and committed together.')
+@click.option('--copy', 'useCopy', is_flag = True, help = 'Insert with PostgreSQL COPY instead of executemany.')
+@click.option('--rejects', 'rejectsPath', type = click.Path(dir_okay = False), help = 'Write rejected records with their errors here (JSON lines).')
+def importCommand(path, kind, chunk_size, useCopy, rejectsPath):
+    '''Import venues, artists or shows from a .csv or .jsonl file.'''
+    if kind is None:
+        kind = next((name for name in KINDS if os.path.basename(path).startswith(name)), None)
+        if kind is None:
+            raise click.UsageError('Cannot tell what ' + path + ' holds; use --kind.')
+    if useCopy and db.engine.dialect.name != 'postgresql':
+        raise click.UsageError('--copy needs PostgreSQL.')
+    rejectsFile = open(rejectsPath, 'w') if rejectsPath else None
+
+    read = inserted = rejected = 0
+    started = time.monotonic()
+    chunk = []
+    rejects = []
+
+    def flush():
+        nonlocal inserted, rejected, chunk, rejects
+        inserted += importChunk(kind, chunk, rejects, useCopy)
+        rejected += len(rejects)
+        if rejectsFile:
+            for record, errors in rejects:
+                rejectsFile.write(json.dumps({'record': record, 'errors': errors}, default = str) + '\n')
+        chunk = []
+        rejects = []
+        elapsed = time.monotonic() - started
+        click.echo('%d read, %d inserted, %d rejected, %.0f rows/s' % (read, inserted, rejected, read / elapsed if elapsed else 0), err = True)
+
+    try:
+        for record in readRecords(path):
+            read += 1
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+    finally:
+        db.session.close()
+        if rejectsFile:
+            rejectsFile.close()
+
+    # the shows listing is not keyed on its validators, so it is dropped by hand; that only reaches the web
+    # server through the socket cache, as the memory cache (and search index) is this process's own
+    if pageCache.shared:
+        showsChanged()
+
+    elapsed = time.monotonic() - started
+    click.echo('Imported %d of %d %s in %.1fs (%.0f rows/s), %d rejected.' % (
+        inserted, read, kind, elapsed, inserted / elapsed if elapsed else 0, rejected))
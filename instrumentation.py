@@ -0,0 +1,153 @@
+import threading
+import time
+from flask import g, request, has_request_context, before_render_template, template_rendered, signals_available
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# raised in test mode when a route repeats the same statement too often or goes over its query budget
+class QueryProblem(Exception):
+    pass
+
+# what one request did: its statements, and the time spent in the database and in templates
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.dbTime = 0.0
+        self.templateTime = 0.0
+        self.statements = {}
+        self.templateStarted = None
+
+# totals per route (Flask endpoint) over all requests of this process
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.dbTime = 0.0
+        self.templateTime = 0.0
+        self.totalTime = 0.0
+        self.maxQueries = 0
+        self.repeatedStatementWarnings = 0
+        self.budgetWarnings = 0
+
+    def snapshot(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'max_queries': self.maxQueries,
+            'mean_queries': self.queries / requests,
+            'db_seconds': self.dbTime,
+            'template_seconds': self.templateTime,
+            'total_seconds': self.totalTime,
+            'mean_total_seconds': self.totalTime / requests,
+            'repeated_statement_warnings': self.repeatedStatementWarnings,
+            'budget_warnings': self.budgetWarnings
+        }
+
+routes = {}
+routesLock = threading.Lock()
+
+# let a view declare the most statements one request of it may issue; goes under the route decorator:
+#
+#   @app.route('/venues')
+#   @queryBudget(1)
+#   def venues():
+def queryBudget(limit):
+    def declare(view):
+        view.queryBudget = limit
+        return view
+    return declare
+
+def currentStats():
+    if has_request_context():
+        return g.get('requestStats')
+    return None
+
+# count and time every statement sent to the database during a request
+@event.listens_for(Engine, 'before_cursor_execute')
+def beforeCursorExecute(connection, cursor, statement, parameters, context, executemany):
+    stats = currentStats()
+    if stats is not None:
+        connection.info.setdefault('queryStarted', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def afterCursorExecute(connection, cursor, statement, parameters, context, executemany):
+    stats = currentStats()
+    started = connection.info.get('queryStarted')
+    if stats is None or not started:
+        return
+    stats.dbTime += time.perf_counter() - started.pop()
+    stats.queries += 1
+    # statements of the same shape have the same text, as the values are sent as parameters
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+def beforeRenderTemplate(sender, template, context, **extra):
+    stats = currentStats()
+    if stats is not None:
+        stats.templateStarted = time.perf_counter()
+
+def templateRendered(sender, template, context, **extra):
+    stats = currentStats()
+    if stats is not None and stats.templateStarted is not None:
+        stats.templateTime += time.perf_counter() - stats.templateStarted
+        stats.templateStarted = None
+
+def beforeRequest():
+    g.requestStats = RequestStats()
+
+# report a problem: a warning in the log, or an exception when the app is being tested
+def problem(app, message):
+    shouldRaise = app.config['RAISE_ON_QUERY_PROBLEMS']
+    if shouldRaise if shouldRaise is not None else app.testing:
+        raise QueryProblem(message)
+    app.logger.warning(message)
+
+def afterRequest(app, response):
+    stats = g.pop('requestStats', None)
+    if stats is None:
+        return response
+    total = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'unknown'
+
+    with routesLock:
+        route = routes.setdefault(endpoint, RouteStats())
+        route.requests += 1
+        route.queries += stats.queries
+        route.dbTime += stats.dbTime
+        route.templateTime += stats.templateTime
+        route.totalTime += total
+        route.maxQueries = max(route.maxQueries, stats.queries)
+
+    response.headers['Server-Timing'] = 'db;dur=%.1f, tpl;dur=%.1f, total;dur=%.1f' % (
+        stats.dbTime * 1000, stats.templateTime * 1000, total * 1000)
+
+    # the same statement over and over with different values is a query per row: an N+1
+    threshold = app.config['REPEATED_STATEMENT_THRESHOLD']
+    for statement, count in stats.statements.items():
+        if count >= threshold:
+            with routesLock:
+                route.repeatedStatementWarnings += 1
+            problem(app, 'Route %s issued the same statement %d times (N+1?): %s' % (endpoint, count, ' '.join(statement.split())[:200]))
+
+    # the async pages (asgi.py) are served by other views than the ones registered, with their own budgets
+    view = g.get('asyncView') or app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'queryBudget', None)
+    if budget is not None and stats.queries > budget:
+        with routesLock:
+            route.budgetWarnings += 1
+        problem(app, 'Route %s issued %d statements, over its budget of %d' % (endpoint, stats.queries, budget))
+    return response
+
+# the totals of every route of this process
+def routeStats():
+    with routesLock:
+        return {endpoint: route.snapshot() for endpoint, route in routes.items()}
+
+def init(app):
+    app.before_request(beforeRequest)
+    app.after_request(lambda response: afterRequest(app, response))
+    # template timing needs blinker for Flask's signals
+    if signals_available:
+        before_render_template.connect(beforeRenderTemplate, app)
+        template_rendered.connect(templateRendered, app)
@@ -0,0 +1,98 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+# what a log record says about the request it was made in: the route, the ids in its url and how long it has run
+def requestContext():
+    if not has_request_context():
+        return {}
+    context = {
+        'route': request.endpoint,
+        'method': request.method,
+        'path': request.path
+    }
+    # venue_id, artist_id, ...
+    context.update(request.view_args or {})
+    started = g.get('logStarted')
+    if started is not None:
+        context['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return context
+
+# puts records on a queue instead of writing them; everything that needs the request (or the exception,
+# which cannot be pickled or kept alive) is read here on the request thread and turned into plain values
+class RequestQueueHandler(QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.context = requestContext()
+        if record.exc_info:
+            record.exceptionType = record.exc_info[0].__name__
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+        record.exc_info = None
+        return record
+
+# one JSON object per line
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'context', {}))
+        if getattr(record, 'exceptionType', None):
+            entry['exception'] = record.exceptionType
+            entry['traceback'] = record.exc_text
+        return json.dumps(entry, default = str)
+
+# the records of every request thread, waiting for the listener
+logQueue = queue.Queue()
+queueHandler = RequestQueueHandler(logQueue)
+listener = None
+
+def beforeRequest():
+    g.logStarted = time.perf_counter()
+
+# the file is written on a thread of its own, so a burst of errors never has a request wait on the disk or a rotation
+def startListener(app):
+    global listener
+    handler = RotatingFileHandler(app.config['LOG_FILE'], maxBytes = app.config['LOG_MAX_BYTES'], backupCount = app.config['LOG_BACKUP_COUNT'])
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(logQueue, handler, respect_handler_level = True)
+    listener.start()
+
+# write out what is still queued; called at exit
+def stopListener():
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+# a forked worker has no listener thread (threads do not survive a fork) and a copy of a queue whose lock the
+# parent's listener may have been holding; give it a queue and a listener of its own
+def afterFork(app):
+    global logQueue, listener
+    logQueue = queue.Queue()
+    queueHandler.queue = logQueue
+    listener = None
+    startListener(app)
+
+def init(app):
+    app.logger.addHandler(queueHandler)
+    # outside debug mode the log file is the only output, so nothing is written to stderr on the request thread either
+    if not app.debug:
+        app.logger.removeHandler(default_handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.before_request(beforeRequest)
+    startListener(app)
+    atexit.register(stopListener)
@@ -0,0 +1,327 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request
+from dbpool import WAIT_BUCKETS, pools
+from cache import pageCache
+
+# upper bounds (in seconds) of the buckets of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# one metric of this process: its value for every combination of label values
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelNames = ()):
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labelNames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def family(self):
+        with self.lock:
+            values = [[list(labels), self.copy(value)] for labels, value in self.values.items()]
+        return {'name': self.name, 'type': self.kind, 'help': self.help, 'labels': list(self.labelNames), 'values': values}
+
+    def copy(self, value):
+        return value
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels = (), amount = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, labels = (), amount = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels = (), amount = 1):
+        self.inc(labels, -amount)
+
+# counts of observations by bucket (not cumulative; made cumulative when written out), with their sum
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelNames = (), buckets = LATENCY_BUCKETS):
+        super().__init__(name, help, labelNames)
+        self.buckets = buckets
+
+    def observe(self, labels, amount):
+        with self.lock:
+            value = self.values.get(labels)
+            if value is None:
+                value = self.values[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    value['buckets'][i] += 1
+                    break
+            value['sum'] += amount
+            value['count'] += 1
+
+    def family(self):
+        family = super().family()
+        family['buckets'] = list(self.buckets)
+        return family
+
+    def copy(self, value):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+
+# the metrics of this process, and functions that read other stats (pools, cache) into families when scraped
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def families(self):
+        families = [metric.family() for metric in self.metrics]
+        for collect in self.collectors:
+            families.extend(collect())
+        return families
+
+registry = Registry()
+
+requestsTotal = registry.add(Counter('fyyur_http_requests_total', 'Requests answered, by endpoint, method and status.', ('endpoint', 'method', 'status')))
+requestLatency = registry.add(Histogram('fyyur_http_request_duration_seconds', 'Time taken to answer a request, by endpoint.', ('endpoint',)))
+requestsInFlight = registry.add(Gauge('fyyur_http_requests_in_flight', 'Requests being answered right now.'))
+formFailures = registry.add(Counter('fyyur_form_validation_failures_total', 'Form submissions rejected as invalid, by form.', ('form',)))
+formFieldErrors = registry.add(Counter('fyyur_form_field_errors_total', 'Fields found invalid in rejected form submissions, by form and field.', ('form', 'field')))
+
+def family(name, kind, help, labels, values, buckets = None):
+    family = {'name': name, 'type': kind, 'help': help, 'labels': list(labels), 'values': values}
+    if buckets is not None:
+        family['buckets'] = list(buckets)
+    return family
+
+def collectPools():
+    snapshots = [stats.snapshot() for stats in pools.values()]
+    return [
+        family('fyyur_db_pool_size', 'gauge', 'Connections the pool keeps open.', ('pool',),
+            [[[s['name']], s['size']] for s in snapshots]),
+        family('fyyur_db_pool_checked_out', 'gauge', 'Connections in use.', ('pool',),
+            [[[s['name']], s['checked_out']] for s in snapshots]),
+        family('fyyur_db_pool_overflow', 'gauge', 'Connections open beyond the pool size.', ('pool',),
+            [[[s['name']], s['overflow']] for s in snapshots]),
+        family('fyyur_db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting for a connection.', ('pool',),
+            [[[s['name']], s['timeouts']] for s in snapshots]),
+        family('fyyur_db_pool_checkout_wait_seconds', 'histogram', 'Time a checkout waited for a connection.', ('pool',),
+            [[[s['name']], {
+                'buckets': [count for bound, count in s['wait_seconds']['buckets']],
+                'sum': s['wait_seconds']['sum'],
+                'count': s['wait_seconds']['count']
+            }] for s in snapshots], WAIT_BUCKETS)
+    ]
+
+def collectCache():
+    return [
+        family('fyyur_cache_hits_total', 'counter', 'Page cache lookups that found the data.', (), [[[], pageCache.hits]]),
+        family('fyyur_cache_misses_total', 'counter', 'Page cache lookups that had to build the data.', (), [[[], pageCache.misses]])
+    ]
+
+registry.collectors.extend([collectPools, collectCache])
+
+# count a form submission rejected as invalid, with each of its invalid fields
+def formInvalid(form):
+    name = type(form).__name__
+    formFailures.inc((name,))
+    for field in form.errors:
+        formFieldErrors.inc((name, field))
+
+def beforeRequest():
+    g.metricsStarted = time.perf_counter()
+    requestsInFlight.inc()
+
+def afterRequest(response):
+    g.metricsStatus = response.status_code
+    return response
+
+# runs even when the view raised, so in-flight always goes back down
+def teardownRequest(app, error):
+    started = g.pop('metricsStarted', None)
+    if started is None:
+        return
+    requestsInFlight.dec()
+    endpoint = request.endpoint or 'unknown'
+    requestLatency.observe((endpoint,), time.perf_counter() - started)
+    requestsTotal.inc((endpoint, request.method, str(g.pop('metricsStatus', 500))))
+    writeSnapshotEvery(app.config['METRICS_DIR'], app.config['METRICS_WRITE_INTERVAL'])
+
+#  Processes
+#  ----------------------------------------------------------------
+# With several worker processes a scrape only reaches one of them. When METRICS_DIR is set, each process writes
+# its families to <pid>.json there every METRICS_WRITE_INTERVAL seconds, and /metrics adds up the files of all;
+# the counters of the processes that have exited are kept in one file, retired.json.
+
+lastWrite = 0.0
+writeLock = threading.Lock()
+
+def snapshotPath(directory, pid):
+    return os.path.join(directory, '%d.json' % pid)
+
+def writeSnapshot(directory):
+    global lastWrite
+    path = snapshotPath(directory, os.getpid())
+    # written aside and renamed, so a scrape never reads half a file
+    with open(path + '.tmp', 'w') as file:
+        json.dump({'pid': os.getpid(), 'families': registry.families()}, file)
+    os.replace(path + '.tmp', path)
+    lastWrite = time.monotonic()
+
+# the file with the counters of the processes that have exited, added up
+RETIRED = 'retired.json'
+
+# fold the counters of a process that has exited into the retired file and remove its own file, so that the
+# files do not pile up as workers are recycled and a new process that gets the same pid starts from zero;
+# the gunicorn master does this when a worker exits (see gunicorn.conf.py), after the worker's last write
+def retireSnapshot(directory, pid):
+    path = snapshotPath(directory, pid)
+    try:
+        with open(path) as file:
+            families = json.load(file)['families']
+    except (OSError, ValueError):
+        return
+    retiredPath = os.path.join(directory, RETIRED)
+    try:
+        with open(retiredPath) as file:
+            families += json.load(file)['families']
+    except (OSError, ValueError):
+        pass
+    merged = merge(f for f in families if f['type'] != 'gauge')
+    retired = [dict(f, values = [[list(labels), value] for labels, value in f['values'].items()]) for f in merged.values()]
+    with open(retiredPath + '.tmp', 'w') as file:
+        json.dump({'pid': None, 'families': retired}, file)
+    os.replace(retiredPath + '.tmp', retiredPath)
+    os.remove(path)
+
+def writeSnapshotEvery(directory, interval):
+    if not directory or time.monotonic() - lastWrite < interval:
+        return
+    # one writer at a time; the other threads skip it instead of waiting
+    if writeLock.acquire(blocking = False):
+        try:
+            writeSnapshot(directory)
+        finally:
+            writeLock.release()
+
+def isAlive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# the families of this process, and those of the other processes from their files; the gauges of processes
+# that have exited are left out (their connections and requests are gone), their counters are kept
+def allFamilies(directory):
+    families = registry.families()
+    if not directory:
+        return families
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+        pid = snapshot['pid']
+        if pid == os.getpid():
+            continue
+        # the retired file has no pid, and only counters
+        alive = pid is not None and isAlive(pid)
+        families.extend(f for f in snapshot['families'] if alive or f['type'] != 'gauge')
+    return families
+
+# add up the families with the same name, label set by label set
+def merge(families):
+    merged = {}
+    for f in families:
+        target = merged.get(f['name'])
+        if target is None:
+            target = merged[f['name']] = dict(f, values = {})
+        for labels, value in f['values']:
+            key = tuple(labels)
+            current = target['values'].get(key)
+            if current is None:
+                target['values'][key] = value if f['type'] != 'histogram' else {
+                    'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+            elif f['type'] == 'histogram':
+                current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                current['sum'] += value['sum']
+                current['count'] += value['count']
+            else:
+                target['values'][key] = current + value
+    return merged
+
+# the hit ratio of the cache over all processes: their hits over their lookups, not the mean of their ratios
+def addCacheHitRatio(merged):
+    hits = sum(merged.get('fyyur_cache_hits_total', {}).get('values', {}).values())
+    misses = sum(merged.get('fyyur_cache_misses_total', {}).get('values', {}).values())
+    merged['fyyur_cache_hit_ratio'] = family('fyyur_cache_hit_ratio', 'gauge', 'Share of page cache lookups that found the data.', (), {})
+    merged['fyyur_cache_hit_ratio']['values'][()] = hits / (hits + misses) if hits + misses else 0.0
+
+#  Text format
+#  ----------------------------------------------------------------
+
+def formatValue(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def formatLabels(names, values, extra = ()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('%s="%s"' % (name, escape(value)) for name, value in pairs) + '}'
+
+# the merged families in the Prometheus text exposition format (version 0.0.4)
+def exposition(merged):
+    lines = []
+    for name in sorted(merged):
+        f = merged[name]
+        lines.append('# HELP %s %s' % (name, f['help']))
+        lines.append('# TYPE %s %s' % (name, f['type']))
+        for labels in sorted(f['values']):
+            value = f['values'][labels]
+            if f['type'] != 'histogram':
+                lines.append('%s%s %s' % (name, formatLabels(f['labels'], labels), formatValue(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(f['buckets'], value['buckets']):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (name, formatLabels(f['labels'], labels, [('le', formatValue(float(bound)))]), cumulative))
+            lines.append('%s_sum%s %s' % (name, formatLabels(f['labels'], labels), formatValue(value['sum'])))
+            lines.append('%s_count%s %d' % (name, formatLabels(f['labels'], labels), value['count']))
+    return '\n'.join(lines) + '\n'
+
+def render(app):
+    merged = merge(allFamilies(app.config['METRICS_DIR']))
+    addCacheHitRatio(merged)
+    return exposition(merged)
+
+def init(app):
+    app.before_request(beforeRequest)
+    app.after_request(afterRequest)
+    app.teardown_request(lambda error: teardownRequest(app, error))
+    directory = app.config['METRICS_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+        # counters of a process that exits between writes would otherwise lose their last few seconds
+        atexit.register(writeSnapshot, directory)
@@ -0,0 +1,55 @@
+"""store show start times as timestamps and index shows by venue/artist and time
+
+Revision ID: 4b7e2d9a1f36
+Revises: c5871131b8ac
+Create Date: 2026-10-18 09:12:40.218337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2d9a1f36'
+down_revision = 'c5871131b8ac'
+branch_labels = None
+depends_on = None
+
+# number of shows converted per statement while backfilling
+BATCH_SIZE = 10000
+
+
+def backfill(expression):
+    # copy start_time into start_time_new one id range at a time, committing every batch,
+    # so that a big shows table is never locked by a single huge UPDATE
+    connection = op.get_bind()
+    low, high = connection.execute(sa.text('SELECT min(id), max(id) FROM shows')).first()
+    if low is None:
+        return
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, BATCH_SIZE):
+            connection.execute(
+                sa.text('UPDATE shows SET start_time_new = ' + expression + ' WHERE id >= :start AND id < :end'),
+                {'start': start, 'end': start + BATCH_SIZE}
+            )
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('start_time_new', sa.DateTime(timezone=True), nullable=True))
+    backfill('start_time::timestamptz')
+    op.alter_column('shows', 'start_time_new', nullable=False)
+    op.drop_column('shows', 'start_time')
+    op.alter_column('shows', 'start_time_new', new_column_name='start_time')
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
+    op.add_column('shows', sa.Column('start_time_new', sa.String(length=120), nullable=True))
+    # write the times back in the ISO format the app used to store
+    backfill("to_char(start_time AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')")
+    op.alter_column('shows', 'start_time_new', nullable=False)
+    op.drop_column('shows', 'start_time')
+    op.alter_column('shows', 'start_time_new', new_column_name='start_time')
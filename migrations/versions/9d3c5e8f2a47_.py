@@ -0,0 +1,26 @@
+"""index the sort keys of the paged venues and shows listings
+
+Revision ID: 9d3c5e8f2a47
+Revises: 4b7e2d9a1f36
+Create Date: 2026-10-18 10:48:03.661972
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3c5e8f2a47'
+down_revision = '4b7e2d9a1f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venues_state_city_id', 'venues', ['state', 'city', 'id'], unique=False)
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_venues_state_city_id', table_name='venues')
@@ -0,0 +1,24 @@
+"""update times of shows, for the validators of the pages
+
+Revision ID: a4e17b9d2c68
+Revises: f2a9c4d86b17
+Create Date: 2026-10-18 16:48:05.217734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e17b9d2c68'
+down_revision = 'f2a9c4d86b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    op.drop_column('shows', 'updated_at')
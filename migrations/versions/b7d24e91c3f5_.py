@@ -0,0 +1,42 @@
+"""upcoming and past show counters on venues and artists, with their watermark
+
+Revision ID: b7d24e91c3f5
+Revises: e1a6f0b3c952
+Create Date: 2026-10-18 11:24:51.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d24e91c3f5'
+down_revision = 'e1a6f0b3c952'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('show_counter_watermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_until', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # count the shows there are, split at now, which becomes the watermark
+    op.execute("INSERT INTO show_counter_watermark (id, rolled_until) VALUES (1, now())")
+    for table, key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(
+            'UPDATE {table} SET '
+            'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id AND shows.start_time >= w.rolled_until), '
+            'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id AND shows.start_time < w.rolled_until) '
+            'FROM show_counter_watermark w'.format(table = table, key = key))
+
+
+def downgrade():
+    op.drop_table('show_counter_watermark')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,27 @@
+"""delete the shows of a venue with it in the database (ON DELETE CASCADE)
+
+Revision ID: d3f8a62c71e4
+Revises: b7d24e91c3f5
+Create Date: 2026-10-18 14:02:37.580916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a62c71e4'
+down_revision = 'b7d24e91c3f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the constraint was created without a name, so it has the one PostgreSQL gives it
+    op.drop_constraint('shows_venue_id_fkey', 'shows', type_='foreignkey')
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('shows_venue_id_fkey', 'shows', type_='foreignkey')
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'])
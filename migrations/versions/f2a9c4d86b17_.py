@@ -0,0 +1,28 @@
+"""versions and update times of venues and artists, for the edits
+
+Revision ID: f2a9c4d86b17
+Revises: d3f8a62c71e4
+Create Date: 2026-10-18 15:37:12.904261
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c4d86b17'
+down_revision = 'd3f8a62c71e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -1,5 +1,35 @@
+from datetime import datetime, timezone
+import dateutil.parser
 from start import db
 
+# a timestamp that is always stored and returned in UTC, so that it can be compared with an aware "now"
+class UTCDateTime(db.TypeDecorator):
+    impl = db.DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        # accept ISO strings (such as the ones stored before the column became a timestamp)
+        if isinstance(value, str):
+            value = dateutil.parser.isoparse(value)
+        # treat naive values as UTC
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        # databases without time zone support give back naive values, which were stored in UTC
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+def utcNow():
+    return datetime.now(timezone.utc)
+
+# genres are a PostgreSQL array, kept as JSON on SQLite (used for test runs)
+StringArray = db.ARRAY(db.String(120)).with_variant(db.JSON(), 'sqlite')
+
 class Venue(db.Model):
     __tablename__ = 'venues'
 
@@ -12,11 +42,25 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(500))
     
-    genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
+    genres = db.Column(StringArray, nullable=False)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
-    shows = db.relationship('Show', back_populates = 'venue', cascade = 'all, delete')
+    # shows starting at or after the counter watermark and before it, kept up to date by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # bumped by every saved edit, which only applies to the version its form was filled from (edits.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # set by every update, the counters' too; the pages are validated against it (conditional.py)
+    updated_at = db.Column(UTCDateTime(), nullable=False, default=utcNow, onupdate=utcNow, server_default=db.func.now())
+    # the database deletes the shows of a venue with it (ON DELETE CASCADE), so they are not loaded to be deleted
+    shows = db.relationship('Show', back_populates = 'venue', cascade = 'all, delete', passive_deletes = True)
+
+    # the venues listing is sorted and paged by state, city and id, and the search looks up names by trigrams
+    __table_args__ = (
+        db.Index('ix_venues_state_city_id', 'state', 'city', 'id'),
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using = 'gin', postgresql_ops = {'name': 'gin_trgm_ops'}),
+    )
 
 class Artist(db.Model):
     __tablename__ = 'artists'
@@ -26,21 +70,50 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
+    genres = db.Column(StringArray, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(500))
     
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
-    shows = db.relationship('Show', lazy = 'joined')
+    # shows starting at or after the counter watermark and before it, kept up to date by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # bumped by every saved edit, which only applies to the version its form was filled from (edits.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # set by every update, the counters' too; the pages are validated against it (conditional.py)
+    updated_at = db.Column(UTCDateTime(), nullable=False, default=utcNow, onupdate=utcNow, server_default=db.func.now())
+    shows = db.relationship('Show', back_populates = 'artist')
+
+    # the search looks up names by trigrams
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using = 'gin', postgresql_ops = {'name': 'gin_trgm_ops'}),
+    )
 
 class Show(db.Model):
   __tablename__ = 'shows'
 
   id = db.Column(db.Integer, primary_key=True)
-  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete = 'CASCADE'))
   artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-  start_time = db.Column(db.String(120), nullable=False)
+  start_time = db.Column(UTCDateTime(), nullable=False)
+  updated_at = db.Column(UTCDateTime(), nullable=False, default=utcNow, onupdate=utcNow, server_default=db.func.now())
   venue = db.relationship('Venue', back_populates = 'shows')
   artist = db.relationship('Artist', back_populates = 'shows')
+
+  # the upcoming/past splits look up the shows of one venue or one artist by time,
+  # and the shows listing is sorted and paged by start time and id
+  __table_args__ = (
+    db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+  )
+
+# the single row with the time up to which the show counters of venues and artists count shows as past;
+# the roll-forward job moves it on (counters.py)
+class ShowCounterWatermark(db.Model):
+  __tablename__ = 'show_counter_watermark'
+
+  id = db.Column(db.Integer, primary_key=True)
+  rolled_until = db.Column(UTCDateTime(), nullable=False)
@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, abort
+from sqlalchemy import tuple_
+
+# number of rows on a page when the request does not ask for a number
+DEFAULT_LIMIT = 50
+# the biggest page a request can ask for
+MAX_LIMIT = 200
+
+# what a request asks for: rows after one cursor or before another, and how many of them
+class PageArgs:
+    def __init__(self, after = None, before = None, limit = DEFAULT_LIMIT):
+        self.after = after
+        self.before = before
+        self.limit = limit
+
+# one page of a listing with the cursors of its neighbouring pages (None when there is no such page)
+class Page:
+    def __init__(self, items, nextCursor, previousCursor, limit):
+        self.items = items
+        self.nextCursor = nextCursor
+        self.previousCursor = previousCursor
+        self.limit = limit
+
+# turn the sort key of a row into an opaque string for a url
+def encodeCursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+# turn a string made by encodeCursor back into a sort key, or None if it is not a valid cursor
+def decodeCursor(cursor, keySize):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != keySize:
+        return None
+    return values
+
+# read ?after=, ?before= and ?limit= from the request; a bad value is a bad request
+def getPageArgs(keySize):
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        abort(400)
+    if limit < 1:
+        abort(400)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    if after is not None:
+        after = decodeCursor(after, keySize)
+        if after is None:
+            abort(400)
+    if before is not None:
+        before = decodeCursor(before, keySize)
+        if before is None:
+            abort(400)
+    return PageArgs(after, before, min(limit, MAX_LIMIT))
+
+# the part of a cache key that tells pages apart
+def pageKey(pageArgs):
+    return (
+        None if pageArgs.after is None else tuple(pageArgs.after),
+        None if pageArgs.before is None else tuple(pageArgs.before),
+        pageArgs.limit
+    )
+
+# get one page of a query by seeking past a sort key instead of using OFFSET,
+# so that the cost of a page does not depend on how deep into the listing it is;
+# the last of the sort columns must be unique, and keyOf gives the sort key of a row
+def keysetPage(query, columns, pageArgs, keyOf):
+    key = tuple_(*columns)
+    if pageArgs.before is not None:
+        # walk backwards from the cursor and turn the rows around afterwards
+        rows = query.filter(key < tuple(pageArgs.before)) \
+            .order_by(*[column.desc() for column in columns]) \
+            .limit(pageArgs.limit + 1).all()
+        hasMore = len(rows) > pageArgs.limit
+        rows = list(reversed(rows[:pageArgs.limit]))
+        hasNext = True
+        hasPrevious = hasMore
+    else:
+        if pageArgs.after is not None:
+            query = query.filter(key > tuple(pageArgs.after))
+        rows = query.order_by(*columns).limit(pageArgs.limit + 1).all()
+        hasMore = len(rows) > pageArgs.limit
+        rows = rows[:pageArgs.limit]
+        hasNext = hasMore
+        hasPrevious = pageArgs.after is not None
+    return Page(
+        rows,
+        encodeCursor(keyOf(rows[-1])) if (hasNext and rows) else None,
+        encodeCursor(keyOf(rows[0])) if (hasPrevious and rows) else None,
+        pageArgs.limit
+    )
@@ -0,0 +1,240 @@
+import asyncio
+from datetime import datetime, timezone
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload, load_only, lazyload
+from start import db
+from models import Venue, Artist, Show
+from pagination import keysetPage
+from asyncdb import fetchAll
+
+# the columns each listing is sorted and paged by
+VENUE_KEY = (Venue.state, Venue.city, Venue.id)
+ARTIST_KEY = (Artist.id,)
+SHOW_KEY = (Show.start_time, Show.id)
+
+# group venue rows, sorted by state and city, into areas in one pass
+def groupByArea(rows):
+    areas = []
+    for row in rows:
+        if not areas or areas[-1]['city'] != row.city or areas[-1]['state'] != row.state:
+            areas.append({'city': row.city, 'state': row.state, 'venues': []})
+        areas[-1]['venues'].append({
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        })
+    return areas
+
+# get a page of venues grouped by city and state, each with its number of upcoming shows (from its counter)
+def getVenueAreas(pageArgs):
+    # sorted so that the venues of the same city and state come next to each other
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+    page = keysetPage(query, VENUE_KEY, pageArgs, lambda row: (row.state, row.city, row.id))
+    page.items = groupByArea(page.items)
+    return page
+
+# get a page of artists, with just the columns the listing shows
+def getArtistsPage(pageArgs):
+    query = db.session.query(Artist.id, Artist.name)
+    page = keysetPage(query, ARTIST_KEY, pageArgs, lambda row: (row.id,))
+    page.items = [{'id': row.id, 'name': row.name} for row in page.items]
+    return page
+
+# get a page of shows in the order in which they happen, with their venue and artist in the same query
+def getShowsPage(pageArgs):
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id) \
+     .join(Artist, Show.artist_id == Artist.id)
+    page = keysetPage(query, SHOW_KEY, pageArgs, lambda row: (row.start_time, row.id))
+    page.items = [{
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'artist_id': row.artist_id,
+        'artist_name': row.artist_name,
+        'artist_image_link': row.artist_image_link,
+        'start_time': row.start_time
+    } for row in page.items]
+    return page
+
+# split shows into upcoming and past ones against a single "now", in the order in which they happen
+def splitShows(shows, describe, now):
+    upcoming = []
+    past = []
+    for show in sorted(shows, key = lambda show: show.start_time):
+        (upcoming if show.start_time >= now else past).append(describe(show))
+    return upcoming, past
+
+# get a venue with all its shows and their artists (two statements in total), or None if there is no such venue
+def getVenueDetail(venueId, now = None):
+    if now is None:
+        now = datetime.now(timezone.utc)
+    # the shows and their artists come in one extra statement; only the artist columns the page uses are loaded
+    venue = db.session.query(Venue).options(
+        selectinload(Venue.shows).joinedload(Show.artist).options(
+            load_only(Artist.id, Artist.name, Artist.image_link),
+            lazyload(Artist.shows)
+        )
+    ).filter(Venue.id == venueId).first()
+    if venue is None:
+        return None
+
+    upcoming, past = splitShows(venue.shows, lambda show: {
+        'artist_id': show.artist.id,
+        'artist_name': show.artist.name,
+        'artist_image_link': show.artist.image_link,
+        'start_time': show.start_time
+    }, now)
+    return describeVenue(venue, upcoming, past)
+
+# the venue page from a venue (or a row with its columns) and its upcoming and past shows
+def describeVenue(venue, upcoming, past):
+    return {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': [] if (venue.genres is None) else venue.genres,
+        'address': venue.address,
+        'city': venue.city,
+        'state': venue.state,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link,
+        'upcoming_shows': upcoming,
+        'past_shows': past,
+        'upcoming_shows_count': len(upcoming),
+        'past_shows_count': len(past)
+    }
+
+# get an artist with all their shows and their venues (two statements in total), or None if there is no such artist
+def getArtistDetail(artistId, now = None):
+    if now is None:
+        now = datetime.now(timezone.utc)
+    artist = db.session.query(Artist).options(
+        selectinload(Artist.shows).joinedload(Show.venue).options(
+            load_only(Venue.id, Venue.name, Venue.image_link)
+        )
+    ).filter(Artist.id == artistId).first()
+    if artist is None:
+        return None
+
+    upcoming, past = splitShows(artist.shows, lambda show: {
+        'venue_id': show.venue.id,
+        'venue_name': show.venue.name,
+        'venue_image_link': show.venue.image_link,
+        'start_time': show.start_time
+    }, now)
+    return describeArtist(artist, upcoming, past)
+
+# the artist page from an artist (or a row with their columns) and their upcoming and past shows
+def describeArtist(artist, upcoming, past):
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'genres': artist.genres,
+        'image_link': artist.image_link,
+        'facebook_link': artist.facebook_link,
+        'website': artist.website,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'past_shows': past,
+        'upcoming_shows': upcoming,
+        'past_shows_count': len(past),
+        'upcoming_shows_count': len(upcoming)
+    }
+
+# the async pages (asgi.py) read the same data with Core statements on the async engine: the entity, its
+# upcoming shows and its past shows do not depend on each other, so the three run at the same time,
+# each on its own connection; the show columns are labelled with the keys of the page
+
+def venueShowsQuery(venueId):
+    return select(
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time
+    ).select_from(Show).join(Artist, Show.artist_id == Artist.id) \
+     .where(Show.venue_id == venueId) \
+     .order_by(Show.start_time)
+
+def artistShowsQuery(artistId):
+    return select(
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time
+    ).select_from(Show).join(Venue, Show.venue_id == Venue.id) \
+     .where(Show.artist_id == artistId) \
+     .order_by(Show.start_time)
+
+# like getVenueDetail, on the async engine
+async def getVenueDetailAsync(venueId, now = None):
+    if now is None:
+        now = datetime.now(timezone.utc)
+    shows = venueShowsQuery(venueId)
+    venues, upcoming, past = await asyncio.gather(
+        fetchAll(select(Venue.__table__).where(Venue.id == venueId)),
+        fetchAll(shows.where(Show.start_time >= now)),
+        fetchAll(shows.where(Show.start_time < now))
+    )
+    if not venues:
+        return None
+    return describeVenue(venues[0], [row._asdict() for row in upcoming], [row._asdict() for row in past])
+
+# like getArtistDetail, on the async engine
+async def getArtistDetailAsync(artistId, now = None):
+    if now is None:
+        now = datetime.now(timezone.utc)
+    shows = artistShowsQuery(artistId)
+    artists, upcoming, past = await asyncio.gather(
+        fetchAll(select(Artist.__table__).where(Artist.id == artistId)),
+        fetchAll(shows.where(Show.start_time >= now)),
+        fetchAll(shows.where(Show.start_time < now))
+    )
+    if not artists:
+        return None
+    return describeArtist(artists[0], [row._asdict() for row in upcoming], [row._asdict() for row in past])
+
+# the validators of the pages (conditional.py): the latest updated_at of the rows a page is made from, and
+# their number, so that a page changes its validators when any of them is edited, added or deleted; counter
+# updates bump the updated_at of their venue or artist, so a show that is added, deleted or has started does too
+def listingValidatorsQuery(model):
+    return select(func.max(model.updated_at), func.count(model.id))
+
+# the shows listing of the API also shows the names of their venues and artists
+def showListingValidatorsQuery():
+    return select(func.max(Show.updated_at), func.count(Show.id),
+        select(func.max(Venue.updated_at)).scalar_subquery(), select(func.max(Artist.updated_at)).scalar_subquery())
+
+def venueValidatorsQuery(venue_id):
+    return (select(Venue.updated_at, func.max(Show.updated_at), func.max(Artist.updated_at), func.count(Show.id))
+        .select_from(Venue)
+        .outerjoin(Show, Show.venue_id == Venue.id)
+        .outerjoin(Artist, Artist.id == Show.artist_id)
+        .where(Venue.id == venue_id)
+        .group_by(Venue.id, Venue.updated_at))
+
+def artistValidatorsQuery(artist_id):
+    return (select(Artist.updated_at, func.max(Show.updated_at), func.max(Venue.updated_at), func.count(Show.id))
+        .select_from(Artist)
+        .outerjoin(Show, Show.artist_id == Artist.id)
+        .outerjoin(Venue, Venue.id == Show.venue_id)
+        .where(Artist.id == artist_id)
+        .group_by(Artist.id, Artist.updated_at))
@@ -0,0 +1,161 @@
+import itertools
+import threading
+from flask import g, request, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, exc, text
+from dbpool import engineOptions
+
+# read/write splitting: views that only read (marked with @replicaRead) run their statements on a read replica,
+# picked round-robin among the healthy ones; everything else, and every flush, goes to the primary. A client
+# that has just written is sent to the primary for a while (a cookie), so it reads its own writes even while
+# the replicas lag behind.
+
+# the cookie that sends a client's reads to the primary after it wrote
+COOKIE = 'read_primary'
+
+# mark a view as reading only, so its statements may go to a replica; goes under the route decorator:
+#
+#   @app.route('/venues')
+#   @replicaRead
+#   def venues():
+def replicaRead(view):
+    view.replicaRead = True
+    return view
+
+# one replica: its engine (and the async one of asgi.py, made when first needed), and whether it answers
+class Replica:
+    def __init__(self, name, uri, config):
+        self.name = name
+        self.uri = uri
+        self.config = config
+        self.engine = create_engine(uri, **engineOptions(config, uri, name))
+        self.asyncEngine = None
+        self.lock = threading.Lock()
+        self.healthy = True
+        event.listen(self.engine, 'handle_error', self.failed)
+
+    # a connection that is lost or cannot be made takes the replica out until the next check
+    def failed(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.healthy = False
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            self.healthy = True
+        except exc.SQLAlchemyError:
+            self.healthy = False
+
+    def getAsyncEngine(self):
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        from asyncdb import asyncUrl
+        with self.lock:
+            if self.asyncEngine is None:
+                url = asyncUrl(self.uri)
+                options = engineOptions(self.config, url.render_as_string(hide_password = False), self.name + '-async', AsyncAdaptedQueuePool)
+                self.asyncEngine = create_async_engine(url, **options)
+                event.listen(self.asyncEngine.sync_engine, 'handle_error', self.failed)
+            return self.asyncEngine
+
+class ReplicaRouter:
+    def __init__(self, config):
+        self.replicas = [Replica('replica-%d' % (i + 1), uri, config) for i, uri in enumerate(config['SQLALCHEMY_REPLICA_URIS'])]
+        self.checkInterval = config['REPLICA_CHECK_INTERVAL']
+        self.window = config['READ_YOUR_WRITES_SECONDS']
+        self.turns = itertools.count()
+        self.lock = threading.Lock()
+
+    # the next healthy replica in turn, or None for the primary
+    def pick(self):
+        with self.lock:
+            turn = next(self.turns)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(turn + i) % len(self.replicas)]
+            if replica.healthy:
+                return replica
+        return None
+
+    # every replica is checked every checkInterval seconds on a thread of its own, so that no request waits
+    # for a replica that is down (or has its statements counted)
+    def startChecks(self):
+        self.stopped = threading.Event()
+        threading.Thread(target = self.checkLoop, args = (self.stopped,), name = 'replica-checks', daemon = True).start()
+
+    def checkLoop(self, stopped):
+        while True:
+            for replica in self.replicas:
+                replica.check()
+            if stopped.wait(self.checkInterval):
+                return
+
+    # the pools made in the parent process are its own, and its check thread did not come along
+    def afterFork(self):
+        for replica in self.replicas:
+            replica.engine.dispose(close = False)
+        self.startChecks()
+
+    async def disposeAsync(self):
+        for replica in self.replicas:
+            if replica.asyncEngine is not None:
+                await replica.asyncEngine.dispose()
+                replica.asyncEngine = None
+
+# the replica the current request reads from, or None when it uses the primary
+def currentReplica():
+    return g.get('readReplica') if has_app_context() else None
+
+# the session of db: statements go to the replica of the request, unless they write
+class RoutingSession(Session):
+    def get_bind(self, mapper = None, clause = None, bind = None, **kwargs):
+        replica = currentReplica()
+        if bind is None and replica is not None and not self._flushing:
+            return replica.engine
+        return super().get_bind(mapper, clause = clause, bind = bind, **kwargs)
+
+# note a write in the request, so that the client is sent to the primary after it (a write can come with any
+# method, and a venue deleted in the background is written after the response)
+def wrote(*args):
+    if has_app_context():
+        g.wrote = True
+
+def executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        wrote()
+
+event.listen(RoutingSession, 'after_flush', wrote)
+event.listen(RoutingSession, 'do_orm_execute', executed)
+
+# made by init when replicas are configured
+router = None
+
+# whether the client of the request has written lately, and so reads from the primary; such a client reads past
+# the page cache entries that carry no validators, which another client may have filled from a lagging replica
+def readsPrimary():
+    return has_request_context() and COOKIE in request.cookies
+
+def beforeRequest(app):
+    view = app.view_functions.get(request.endpoint)
+    if getattr(view, 'replicaRead', False) and not readsPrimary():
+        g.readReplica = router.pick()
+
+def afterRequest(app, response):
+    view = app.view_functions.get(request.endpoint)
+    unsafe = request.method not in ('GET', 'HEAD', 'OPTIONS') and not getattr(view, 'replicaRead', False)
+    if (unsafe or g.get('wrote')) and response.status_code < 500:
+        response.set_cookie(COOKIE, '1', max_age = router.window, httponly = True, samesite = 'Lax')
+    return response
+
+def afterFork():
+    if router is not None:
+        router.afterFork()
+
+def init(app):
+    global router
+    if not app.config['SQLALCHEMY_REPLICA_URIS']:
+        return
+    router = ReplicaRouter(app.config)
+    router.startChecks()
+    app.before_request(lambda: beforeRequest(app))
+    app.after_request(lambda response: afterRequest(app, response))
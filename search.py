@@ -0,0 +1,177 @@
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import func, event, select
+from sqlalchemy.orm import Session, object_session
+from start import db
+from models import Venue, Artist
+from asyncdb import getEngine, fetchAll
+
+# number of results a search returns when the request does not ask for a number
+DEFAULT_LIMIT = 50
+# the most results a single search can ask for
+MAX_LIMIT = 200
+
+# the trigrams pg_trgm compares: every word in lower case, padded with two spaces in front and one behind
+def trigrams(text):
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# the same number pg_trgm's similarity() gives: shared trigrams over all trigrams of both strings
+def similarity(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+# every three letters in a row of a lower case string; a substring has only trigrams its string has too
+def windows(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+# pure Python trigram index over the names of one table, used when the database has no pg_trgm (SQLite)
+class TrigramIndex:
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.stale = True
+        self.names = {}
+        self.grams = {}
+        self.windows = defaultdict(set)
+
+    # forget the index; it is built again on the next search
+    def invalidate(self):
+        self.stale = True
+
+    def rebuild(self):
+        names = dict(db.session.query(self.model.id, self.model.name).all())
+        grams = {}
+        index = defaultdict(set)
+        for id, name in names.items():
+            grams[id] = trigrams(name)
+            for window in windows(name.lower()):
+                index[window].add(id)
+        self.names, self.grams, self.windows = names, grams, index
+        self.stale = False
+
+    # ids and names of the names that contain the word, best matches first, and the number of all matches
+    def search(self, word, limit):
+        with self.lock:
+            if self.stale:
+                self.rebuild()
+            word = word.lower()
+            # narrow the candidates down to the names that have every trigram of the word
+            if len(word) >= 3:
+                candidates = None
+                for window in windows(word):
+                    ids = self.windows.get(window, set())
+                    candidates = ids if candidates is None else candidates & ids
+            else:
+                candidates = self.names.keys()
+            matches = [id for id in candidates if word in self.names[id].lower()]
+            wordGrams = trigrams(word)
+            matches.sort(key = lambda id: (-similarity(wordGrams, self.grams[id]), id))
+            return [(id, self.names[id]) for id in matches[:limit]], len(matches)
+
+indexes = {
+    Venue: TrigramIndex(Venue),
+    Artist: TrigramIndex(Artist)
+}
+
+# keep the in-memory indexes in step with every insert, update and delete made through the ORM;
+# an index is only dropped once the change is committed, so that it is never rebuilt from data that is rolled back
+# (statements that skip the ORM, such as the updates of edits.py, mark the index of their model themselves)
+def markIndexDirty(session, model):
+    session.info.setdefault('dirtySearchIndexes', set()).add(model)
+
+def markChangedIndexDirty(mapper, connection, target):
+    markIndexDirty(object_session(target), type(target))
+
+def invalidateDirtyIndexes(session):
+    for model in session.info.pop('dirtySearchIndexes', ()):
+        indexes[model].invalidate()
+
+def forgetDirtyIndexes(session):
+    session.info.pop('dirtySearchIndexes', None)
+
+for model in indexes:
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, markChangedIndexDirty)
+event.listen(Session, 'after_commit', invalidateDirtyIndexes)
+event.listen(Session, 'after_rollback', forgetDirtyIndexes)
+
+# make % and _ in the search term match themselves (with / as the escape character)
+def escapeLike(word):
+    return word.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+# read the number of results to return from the request form; a bad value falls back to the default
+def getLimit(form):
+    try:
+        limit = int(form.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+# the ids and names of venues or artists containing the word (ignoring case), best matches first, each with
+# its number of upcoming shows (from its counter), and the number of all matches; on PostgreSQL the ILIKE is
+# answered by the pg_trgm GIN index on the name, the ranking by similarity(), and the total by a window count
+def rankedQuery(model, word, limit):
+    return select(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        func.count().over().label('total')
+    ).where(model.name.ilike('%' + escapeLike(word) + '%', escape = '/')) \
+     .order_by(func.similarity(model.name, word).desc(), model.id) \
+     .limit(limit)
+
+# without pg_trgm: the upcoming show counters of the matches found in memory
+def upcomingCountsQuery(model, ids):
+    return select(model.id, model.upcoming_shows_count).where(model.id.in_(ids))
+
+# the response the search templates expect
+def rankedResponse(rows):
+    return {
+        'count': rows[0].total if rows else 0,
+        'data': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in rows]
+    }
+
+def matchesResponse(matches, total, counts):
+    return {
+        'count': total,
+        'data': [{
+            'id': id,
+            'name': name,
+            'num_upcoming_shows': counts.get(id, 0)
+        } for id, name in matches]
+    }
+
+# search names of venues or artists containing the word (ignoring case), best matches first,
+# each with its number of upcoming shows; gives the response the search templates expect
+def search(model, word, limit = DEFAULT_LIMIT):
+    word = word or ''
+    if db.engine.dialect.name == 'postgresql':
+        return rankedResponse(db.session.execute(rankedQuery(model, word, limit)).all())
+
+    # without pg_trgm, find the matches in memory and read their counters in one query
+    matches, total = indexes[model].search(word, limit)
+    ids = [id for id, name in matches]
+    counts = dict(db.session.execute(upcomingCountsQuery(model, ids)).all()) if ids else {}
+    return matchesResponse(matches, total, counts)
+
+# like search, on the async engine (asgi.py); an index in memory that is stale is still built again
+# with the session of the request, which holds up the event loop for as long as that takes
+async def searchAsync(model, word, limit = DEFAULT_LIMIT):
+    word = word or ''
+    if getEngine().dialect.name == 'postgresql':
+        return rankedResponse(await fetchAll(rankedQuery(model, word, limit)))
+
+    matches, total = indexes[model].search(word, limit)
+    ids = [id for id, name in matches]
+    counts = dict(await fetchAll(upcomingCountsQuery(model, ids))) if ids else {}
+    return matchesResponse(matches, total, counts)
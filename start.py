@@ -1,11 +1,41 @@
+import os
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import create_engine
 from flask_migrate import Migrate
+from dbpool import engineOptions
+from replicas import RoutingSession
 
 app = Flask(__name__)
-moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
\ No newline at end of file
+# before anything touches app.jinja_env, which is made from these options
+if app.config['TEMPLATE_BYTECODE_DIR']:
+    os.makedirs(app.config['TEMPLATE_BYTECODE_DIR'], exist_ok = True)
+app.jinja_options = dict(app.jinja_options, bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_BYTECODE_DIR']))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engineOptions(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+moment = Moment(app)
+# statements of the views that only read go to a replica when there are any (replicas.py)
+db = SQLAlchemy(app, session_options = {'class_': RoutingSession})
+migrate = Migrate(app, db)
+
+# the app of this module with all its routes, for WSGI servers (gunicorn 'start:loadRoutes()'); the routes are
+# registered on it when app.py is imported, so a preloading server gets them in the master process. This is not
+# a factory: every call gives the same app, configured once from config.py
+def loadRoutes():
+    import app as routes
+    return app
+
+# in a worker forked from the process that loaded the app: the connections of the parent's pool must not be
+# shared, so the pool starts empty (close = False leaves the parent's connections to the parent), and neither
+# the log listener thread nor the cache sockets of the parent came along
+def afterFork():
+    import logs
+    import replicas
+    from cache import pageCache
+    with app.app_context():
+        db.engine.dispose(close = False)
+    replicas.afterFork()
+    logs.afterFork(app)
+    pageCache.afterFork()
@@ -0,0 +1,102 @@
+# The tests run the app on a SQLite database of their own, filled with the benchmarks' generator (see
+# benchmarks/generate.py), and with TESTING on, so a route that goes over its query budget or repeats a
+# statement (an N+1) fails the request that did it.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import tempfile
+import pytest
+
+# the settings are read when the app is imported, so they are made before anything imports it
+directory = tempfile.mkdtemp(prefix = 'fyyur-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'fyyur-test.db')
+# the generator drops the tables of this database only
+os.environ['BENCHMARK_DATABASE_URL'] = os.environ['DATABASE_URL']
+os.environ['LOG_FILE'] = os.path.join(directory, 'error.log')
+os.environ['TEMPLATE_BYTECODE_DIR'] = os.path.join(directory, 'templates')
+os.environ['COUNTER_ROLL_INTERVAL'] = '0'
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+os.environ.pop('METRICS_DIR', None)
+os.environ['CACHE_BACKEND'] = 'memory'
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+# venues and artists of the generated data, with ten times as many shows
+SIZE = 40
+
+@pytest.fixture(scope = 'session')
+def app():
+    from app import app
+    from start import db
+    from generate import generate, resetDatabase
+    app.config.update(TESTING = True, WTF_CSRF_ENABLED = False)
+    with app.app_context():
+        resetDatabase(db)
+        generate(db, SIZE, SIZE, SIZE * 10, seed = 1)
+    return app
+
+@pytest.fixture
+def db(app):
+    from start import db
+    with app.app_context():
+        yield db
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+# every test starts with an empty page cache, so it sees what the database has
+@pytest.fixture(autouse = True)
+def emptyCache():
+    from cache import pageCache
+    for namespace in ('venues', 'artists', 'shows', 'venue', 'artist', 'fragment'):
+        pageCache.invalidateAll(namespace)
+
+# a new venue and artist of their own for a test, so that the changes it makes do not reach the others
+@pytest.fixture
+def venue(db):
+    from models import Venue
+    venue = Venue(name = 'Fixture Venue', city = 'Austin', state = 'TX', address = '1 Main St', phone = '512-555-0100', genres = ['Jazz'])
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+@pytest.fixture
+def artist(db):
+    from models import Artist
+    artist = Artist(name = 'Fixture Artist', city = 'Austin', state = 'TX', phone = '512-555-0100', genres = ['Jazz'])
+    db.session.add(artist)
+    db.session.commit()
+    return artist.id
+
+# add a show with the ORM, which counts it
+@pytest.fixture
+def addShow(db):
+    from models import Show
+    def add(venueId, artistId, startTime):
+        show = Show(venue_id = venueId, artist_id = artistId, start_time = startTime)
+        db.session.add(show)
+        db.session.commit()
+        return show.id
+    return add
+
+# the counters that differ from a count of the shows
+@pytest.fixture
+def drift(db):
+    from counters import findDrift
+    def check():
+        with db.engine.begin() as connection:
+            return findDrift(connection)
+    return check
+
+# counts the statements sent to the database (see benchmarks/endpoints.py)
+@pytest.fixture(scope = 'session')
+def statements(app):
+    from start import db
+    from endpoints import StatementCounter
+    with app.app_context():
+        return StatementCounter(db.engine)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+# the form of a venue, as the create and edit pages send it
+def venueForm(**values):
+    form = {
+        'name': 'Test Venue',
+        'city': 'Austin',
+        'state': 'TX',
+        'address': '1 Main St',
+        'phone': '512-555-0100',
+        'genres': ['Jazz', 'Blues'],
+        'facebook_link': 'https://www.facebook.com/testvenue',
+        'image_link': '',
+        'website_link': '',
+        'seeking_description': ''
+    }
+    form.update(values)
+    return form
+
+def artistForm(**values):
+    form = {
+        'name': 'Test Artist',
+        'city': 'Austin',
+        'state': 'TX',
+        'phone': '512-555-0100',
+        'genres': ['Jazz'],
+        'facebook_link': 'https://www.facebook.com/testartist',
+        'image_link': '',
+        'website_link': '',
+        'seeking_description': ''
+    }
+    form.update(values)
+    return form
+
+def utcNow():
+    return datetime.now(timezone.utc)
+
+# the upcoming and past show counters of a venue or artist, as stored
+def counts(db, model, id):
+    db.session.expire_all()
+    entity = db.session.get(model, id)
+    return entity.upcoming_shows_count, entity.past_shows_count
@@ -0,0 +1,36 @@
+import json
+from sqlalchemy import select, func, update
+from models import Venue
+from helpers import venueForm
+
+def testCollectionStreamsEveryRow(db, client):
+    response = client.get('/api/v1/venues')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text = True).splitlines()]
+    assert len(rows) == db.session.execute(select(func.count(Venue.id))).scalar()
+
+# the tag of a collection comes from its rows (the latest updated_at and their number), so an edit in any
+# process changes it
+def testCollectionTagChangesWithAnEdit(app, client, venue):
+    response = client.get('/api/v1/venues')
+    response.get_data()
+    tag = response.headers['ETag']
+    assert client.get('/api/v1/venues', headers = {'If-None-Match': tag}).status_code == 304
+    assert app.test_client().post('/venues/%d/edit' % venue, data = venueForm(name = 'Edited For Api')).status_code in (200, 302)
+    response = client.get('/api/v1/venues', headers = {'If-None-Match': tag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != tag
+    assert 'Edited For Api' in response.get_data(as_text = True)
+
+def testEntity(client, venue):
+    response = client.get('/api/v1/venues/%d' % venue)
+    assert response.get_json()['name'] == 'Fixture Venue'
+    assert client.get('/api/v1/venues/%d' % venue, headers = {'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/api/v1/venues/999999').status_code == 404
+
+# an edit made by another process drops nothing from this one's cache; the entry follows the validators
+def testEntityFollowsAnEditElsewhere(db, client, venue):
+    assert client.get('/api/v1/venues/%d' % venue).get_json()['name'] == 'Fixture Venue'
+    db.session.execute(update(Venue).where(Venue.id == venue).values(name = 'Edited Elsewhere'))
+    db.session.commit()
+    assert client.get('/api/v1/venues/%d' % venue).get_json()['name'] == 'Edited Elsewhere'
@@ -0,0 +1,39 @@
+import asyncio
+import asgi
+import asyncdb
+from instrumentation import routeStats
+
+# send one GET to the ASGI app; gives the status, the headers and the body
+async def get(path, headers = ()):
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 1), 'scheme': 'http', 'http_version': '1.1'
+    }
+    messages = []
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    async def send(message):
+        messages.append(message)
+    await asgi.application(scope, receive, send)
+    headers = {name.decode().lower(): value.decode() for name, value in messages[0]['headers']}
+    return messages[0]['status'], headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+# the pages served on the event loop stay within the budgets of their async views, and answer conditional
+# requests like the WSGI ones
+def testAsyncPages(app, venue, artist):
+
+    async def run():
+        try:
+            for endpoint, path in (('show_venue', '/venues/%d' % venue), ('show_artist', '/artists/%d' % artist)):
+                before = routeStats().get(endpoint, {}).get('queries', 0)
+                status, headers, body = await get(path)
+                assert status == 200
+                assert routeStats()[endpoint]['queries'] - before <= asgi.VIEWS[endpoint].queryBudget
+                status, headers, body = await get(path, [('If-None-Match', headers['etag'])])
+                assert status == 304
+            assert (await get('/venues/999999'))[0] == 404
+        finally:
+            await asyncdb.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+import pytest
+from endpoints import ROUTES, Context, send
+
+# the view a request goes to
+def viewOf(app, method, path):
+    endpoint = app.url_map.bind('localhost').match(path.split('?')[0], method = method)[0]
+    return app.view_functions[endpoint]
+
+# every route of the benchmarks, on a cold page cache: the app raises QueryProblem (TESTING) when a request goes
+# over the budget of its view or repeats a statement, and the statements are counted here as well, streamed
+# bodies included
+@pytest.mark.parametrize('route', ROUTES, ids = [route[0] for route in ROUTES])
+def testRouteStaysWithinItsBudget(app, db, client, statements, route):
+    name, method, makePath, makeData, share = route
+    context = Context(app, db, client, seed = 1)
+    path = makePath(context)
+    data = makeData(context) if makeData else None
+    before = statements.count
+    response = send(client, method, path, data)
+    assert response.status_code < 400
+    budget = getattr(viewOf(app, method, path), 'queryBudget', None)
+    if budget is not None:
+        assert statements.count - before <= budget
+
+# a page deep into a listing costs what the first one does, as it seeks past a cursor instead of skipping rows
+@pytest.mark.parametrize('listing', ['/venues', '/artists', '/shows'])
+def testEveryPageStaysWithinTheBudget(app, client, statements, listing):
+    budget = app.view_functions[listing.strip('/')].queryBudget
+    path = listing + '?limit=3'
+    marker = '<li class="next"><a href="'
+    for page in range(5):
+        before = statements.count
+        html = send(client, 'GET', path, None).get_data(as_text = True)
+        assert statements.count - before <= budget
+        assert marker in html
+        start = html.index(marker) + len(marker)
+        path = html[start:html.index('"', start)].replace('&amp;', '&')
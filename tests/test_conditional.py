@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+import pytest
+from sqlalchemy import false
+from models import Venue, Artist
+from counters import rollForward
+from queries import listingValidatorsQuery
+from helpers import venueForm, utcNow
+
+PAGES = ['/venues', '/artists', '/venues/%d', '/artists/%d']
+
+def pagePath(path, venue, artist):
+    return path % (venue if path.startswith('/venues') else artist) if '%d' in path else path
+
+@pytest.mark.parametrize('path', PAGES)
+def testRevalidationIsNotModified(client, venue, artist, path):
+    path = pagePath(path, venue, artist)
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('W/')
+    assert response.last_modified is not None
+    again = client.get(path, headers = {'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+    assert client.get(path, headers = {'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+# a listing of an empty table has no times in its validators row, and goes out with an ETag alone
+@pytest.mark.parametrize('endpoint, model', [('venues', Venue), ('artists', Artist)])
+def testEmptyListingHasNoLastModified(app, client, monkeypatch, endpoint, model):
+    monkeypatch.setattr(app.view_functions[endpoint], 'validators', lambda: listingValidatorsQuery(model).where(false()))
+    response = client.get('/' + endpoint)
+    assert response.status_code == 200
+    assert response.last_modified is None
+    assert client.get('/' + endpoint, headers = {'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def testEditChangesTheTag(app, client, venue):
+    path = '/venues/%d' % venue
+    tag = client.get(path).headers['ETag']
+    editor = app.test_client()
+    assert editor.post(path + '/edit', data = venueForm(name = 'Renamed Venue')).status_code in (200, 302)
+    response = client.get(path, headers = {'If-None-Match': tag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != tag
+    assert 'Renamed Venue' in response.get_data(as_text = True)
+
+def testListingTagChangesWithANewVenue(client):
+    tag = client.get('/venues').headers['ETag']
+    assert client.post('/venues/create', data = venueForm(name = 'Brand New Venue')).status_code in (200, 302)
+    response = client.get('/venues', headers = {'If-None-Match': tag})
+    assert response.status_code == 200
+    assert 'Brand New Venue' in response.get_data(as_text = True)
+
+# the page is cached with its tag, so a roll that moves a show to past is served with a new tag and a body
+# that shows it, never a new tag on the cached body of the old one
+def testRollChangesTagAndBody(db, client, venue, artist, addShow):
+    path = '/venues/%d' % venue
+    addShow(venue, artist, utcNow() + timedelta(seconds = 1))
+    response = client.get(path)
+    assert '1 Upcoming Show<' in response.get_data(as_text = True)
+    time.sleep(1.2)
+    # rolled by another process, which drops nothing from this one's cache
+    with db.engine.begin() as connection:
+        assert rollForward(connection) == 1
+    again = client.get(path, headers = {'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 200
+    assert again.headers['ETag'] != response.headers['ETag']
+    assert '1 Past Show<' in again.get_data(as_text = True)
+
+# a client with a flashed message to see gets the whole page, and it is not kept by anyone else
+def testSessionCookieGetsAPrivatePage(client, venue):
+    path = '/venues/%d' % venue
+    tag = client.get(path).headers['ETag']
+    client.set_cookie('localhost', 'session', 'flashed')
+    response = client.get(path, headers = {'If-None-Match': tag})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'ETag' not in response.headers
+
+def testMissingVenueIsNotFound(client):
+    assert client.get('/venues/999999').status_code == 404
@@ -0,0 +1,31 @@
+from datetime import timedelta
+import pytest
+from models import Venue, Artist
+from counters import rebuild, rollCounters
+from helpers import utcNow, counts
+
+# the watermark is put back at now after a test moves it
+@pytest.fixture
+def rebuildAfter(db):
+    yield
+    with db.engine.begin() as connection:
+        rebuild(connection)
+
+def testGeneratedDataHasNoDrift(drift):
+    assert drift() == []
+
+def testShowsAreCountedWhenAdded(db, client, drift, venue, artist, addShow):
+    addShow(venue, artist, utcNow() - timedelta(days = 2))
+    response = client.post('/shows/create', data = {'venue_id': venue, 'artist_id': artist, 'start_time': '2030-01-01 20:00:00'})
+    assert response.status_code < 400
+    assert counts(db, Venue, venue) == (1, 1)
+    assert counts(db, Artist, artist) == (1, 1)
+    assert drift() == []
+
+def testRollMovesStartedShowsToPast(db, drift, venue, artist, addShow, rebuildAfter):
+    addShow(venue, artist, utcNow() + timedelta(hours = 1))
+    assert counts(db, Venue, venue) == (1, 0)
+    assert rollCounters(utcNow() + timedelta(hours = 2)) >= 1
+    assert counts(db, Venue, venue) == (0, 1)
+    assert counts(db, Artist, artist) == (0, 1)
+    assert drift() == []
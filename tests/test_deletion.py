@@ -0,0 +1,66 @@
+import threading
+from datetime import timedelta
+from sqlalchemy import insert, select, func
+import deletion
+from models import Venue, Artist, Show
+from counters import countShows
+from helpers import utcNow, counts
+
+# the session deletes a venue with some of its shows loaded and the rest left to the database's cascade
+def testOrmVenueDeleteUncountsItsShows(db, drift, venue, artist, addShow):
+    for days in (-3, -1, 2, 5):
+        addShow(venue, artist, utcNow() + timedelta(days = days))
+    db.session.expire_all()
+    entity = db.session.get(Venue, venue)
+    entity.shows[0]
+    db.session.delete(entity)
+    db.session.commit()
+    assert counts(db, Artist, artist) == (0, 0)
+    assert drift() == []
+
+def testDeleteRouteUncountsTheShows(db, client, drift, venue, artist, addShow):
+    addShow(venue, artist, utcNow() + timedelta(days = 1))
+    response = client.delete('/venues/%d' % venue)
+    assert response.status_code == 200
+    assert response.get_json() == {'id': venue, 'deleted': True}
+    assert db.session.get(Venue, venue) is None
+    assert db.session.execute(select(func.count(Show.id)).where(Show.venue_id == venue)).scalar() == 0
+    assert counts(db, Artist, artist) == (0, 0)
+    assert drift() == []
+
+def testDeleteOfMissingVenueIsJsonNotFound(client):
+    response = client.delete('/venues/999999')
+    assert response.status_code == 404
+    assert response.is_json
+    assert client.post('/venues/999999/delete').status_code == 404
+
+# a show added after the last batch, before the venue itself goes, is taken off the counters with it
+def testBatchedDeleteCountsLateShows(db, drift, monkeypatch, venue, artist, addShow):
+    for days in range(1, 8):
+        addShow(venue, artist, utcNow() + timedelta(days = days))
+    db.session.close()
+    uncountAndDelete = deletion.uncountAndDelete
+    def addLateShow(connection, venueId):
+        with db.engine.begin() as other:
+            row = {'venue_id': venueId, 'artist_id': artist, 'start_time': utcNow() + timedelta(days = 9)}
+            other.execute(insert(Show), [row])
+            countShows(other, [(venueId, artist, row['start_time'], 1)])
+        return uncountAndDelete(connection, venueId)
+    monkeypatch.setattr(deletion, 'uncountAndDelete', addLateShow)
+    deletion.deleteVenueInBatches(venue, 3)
+    assert db.session.get(Venue, venue) is None
+    assert counts(db, Artist, artist) == (0, 0)
+    assert drift() == []
+
+def testBigVenueIsDeletedInTheBackground(app, db, client, drift, monkeypatch, venue, artist, addShow):
+    for days in range(1, 6):
+        addShow(venue, artist, utcNow() + timedelta(days = days))
+    monkeypatch.setitem(app.config, 'VENUE_DELETE_BACKGROUND_SHOWS', 2)
+    monkeypatch.setitem(app.config, 'VENUE_DELETE_BATCH_SIZE', 2)
+    response = client.delete('/venues/%d' % venue)
+    assert response.status_code == 202
+    for thread in threading.enumerate():
+        if thread.name == 'delete-venue-%d' % venue:
+            thread.join(10)
+    assert db.session.get(Venue, venue) is None
+    assert drift() == []
@@ -0,0 +1,37 @@
+import re
+import pytest
+from models import Venue
+from helpers import venueForm, artistForm
+
+def formVersion(html):
+    found = re.search(r'name="version"[^>]*value="(\d+)"|value="(\d+)"[^>]*name="version"', html)
+    return int(found.group(1) or found.group(2))
+
+# two people open the edit form of the same entity; the second to save is told, and shown the form again
+# at the version that is there now, so saving it once more overwrites the first edit knowingly
+@pytest.mark.parametrize('kind, makeForm', [('venues', venueForm), ('artists', artistForm)])
+def testStaleEditIsRefused(app, client, venue, artist, kind, makeForm):
+    id = venue if kind == 'venues' else artist
+    path = '/%s/%d/edit' % (kind, id)
+    version = formVersion(client.get(path).get_data(as_text = True))
+
+    assert client.post(path, data = makeForm(name = 'First', version = version)).status_code in (200, 302)
+    response = client.post(path, data = makeForm(name = 'Second', version = version))
+    assert response.status_code == 409
+    assert formVersion(response.get_data(as_text = True)) == version + 1
+    assert 'First' in client.get('/%s/%d' % (kind, id)).get_data(as_text = True)
+
+    assert client.post(path, data = makeForm(name = 'Second', version = version + 1)).status_code in (200, 302)
+    assert 'Second' in client.get('/%s/%d' % (kind, id)).get_data(as_text = True)
+
+# an edit that changes nothing leaves the version alone, so it does not make other open forms stale
+def testUnchangedEditKeepsTheVersion(db, client, venue):
+    path = '/venues/%d/edit' % venue
+    client.post(path, data = venueForm(name = 'Same', version = 1))
+    version = db.session.get(Venue, venue).version
+    db.session.expire_all()
+    client.post(path, data = venueForm(name = 'Same', version = version))
+    assert db.session.get(Venue, venue).version == version
+
+def testEditOfMissingVenueIsNotFound(client):
+    assert client.post('/venues/999999/edit', data = venueForm()).status_code == 404
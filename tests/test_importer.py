@@ -0,0 +1,47 @@
+import json
+from sqlalchemy import select, func
+from models import Venue
+
+def runImport(app, tmp_path, name, lines):
+    path = tmp_path / name
+    path.write_text(''.join(line + '\n' for line in lines))
+    rejects = tmp_path / 'rejects.jsonl'
+    result = app.test_cli_runner().invoke(args = ['import', str(path), '--rejects', str(rejects)])
+    assert result.exit_code == 0, result.output
+    return [json.loads(line) for line in rejects.read_text().splitlines()]
+
+def venueRecord(**values):
+    record = {'name': 'Imported Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+        'phone': '512-555-0100', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/imported'}
+    record.update(values)
+    return json.dumps(record)
+
+# a malformed line is rejected on its own, with its error, and the good lines of its chunk still go in
+def testMalformedRecordsAreRejectedOneByOne(app, db, tmp_path):
+    before = db.session.execute(select(func.count(Venue.id))).scalar()
+    rejects = runImport(app, tmp_path, 'venues.jsonl', [
+        venueRecord(name = 'Good Import 1'),
+        '[1, 2, 3]',
+        '"just a string"',
+        '{not json',
+        venueRecord(name = 'Bad Genres', genres = 5),
+        venueRecord(name = 'Bad Genre List', genres = ['Jazz', 7]),
+        venueRecord(name = 'Bad Phone', phone = 'call me'),
+        venueRecord(name = 'Good Import 2', genres = 'Jazz; Blues')
+    ])
+    assert [reject['record'] for reject in rejects][:3] == [[1, 2, 3], 'just a string', '{not json']
+    assert sorted(reject['record']['name'] for reject in rejects[3:]) == ['Bad Genre List', 'Bad Genres', 'Bad Phone']
+    assert all(reject['errors'] for reject in rejects)
+    db.session.expire_all()
+    assert db.session.execute(select(func.count(Venue.id))).scalar() == before + 2
+
+def testImportedShowsAreCounted(app, db, tmp_path, drift, venue, artist):
+    rejects = runImport(app, tmp_path, 'shows.jsonl', [
+        json.dumps({'venue_id': venue, 'artist_id': artist, 'start_time': '2030-01-01T20:00:00'}),
+        json.dumps({'venue_id': 999999, 'artist_id': artist, 'start_time': '2030-01-01T20:00:00'}),
+        json.dumps({'venue_id': venue, 'artist_id': artist, 'start_time': 'soon'})
+    ])
+    assert sorted(sorted(reject['errors']) for reject in rejects) == [['start_time'], ['venue_id']]
+    db.session.expire_all()
+    assert db.session.get(Venue, venue).upcoming_shows_count == 1
+    assert drift() == []
@@ -0,0 +1,37 @@
+import json
+import os
+import metrics
+
+def snapshot(directory, pid, requests, inFlight):
+    families = [
+        metrics.family('fyyur_http_requests_total', 'counter', 'Requests.', ('endpoint',), [[['venues'], requests]]),
+        metrics.family('fyyur_http_requests_in_flight', 'gauge', 'In flight.', (), [[[], inFlight]]),
+        metrics.family('fyyur_http_request_duration_seconds', 'histogram', 'Latency.', ('endpoint',),
+            [[['venues'], {'buckets': [requests, 0], 'sum': 0.5, 'count': requests}]], (0.1, float('inf')))
+    ]
+    with open(metrics.snapshotPath(directory, pid), 'w') as file:
+        json.dump({'pid': pid, 'families': families}, file)
+
+def totals(directory):
+    merged = metrics.merge(f for f in metrics.allFamilies(directory) if f['name'].startswith('fyyur_http'))
+    return (merged['fyyur_http_requests_total']['values'].get(('venues',)),
+        merged['fyyur_http_request_duration_seconds']['values'].get(('venues',), {}).get('count'),
+        merged.get('fyyur_http_requests_in_flight', {}).get('values', {}).get(()))
+
+# workers that exit leave their counters in one file, and a new worker with a pid used before starts from zero
+def testExitedWorkersAreRetired(app, tmp_path):
+    directory = str(tmp_path)
+    before = totals(directory)
+    snapshot(directory, 999990, 3, 1)
+    snapshot(directory, 999991, 4, 1)
+    metrics.retireSnapshot(directory, 999990)
+    metrics.retireSnapshot(directory, 999991)
+    assert sorted(os.listdir(directory)) == [metrics.RETIRED]
+    requests, latencies, inFlight = totals(directory)
+    assert requests - (before[0] or 0) == 7
+    assert latencies - (before[1] or 0) == 7
+
+    snapshot(directory, 999990, 1, 1)
+    assert totals(directory)[0] - (before[0] or 0) == 8
+    # a worker that is gone without being retired still counts, but its gauges do not
+    assert totals(directory)[2] == before[2]
@@ -0,0 +1,59 @@
+import re
+from sqlalchemy import select
+from models import Venue, Show
+from pagination import PageArgs, encodeCursor, decodeCursor
+from queries import getShowsPage
+
+# the urls of the next and previous pages of a listing page, None where there is none
+def pagerLinks(html):
+    links = []
+    for name in ('next', 'previous'):
+        found = re.search(r'<li class="%s"><a href="([^"]+)"' % name, html)
+        links.append(found.group(1).replace('&amp;', '&') if found else None)
+    return links
+
+def venueIds(html):
+    return [int(id) for id in re.findall(r'href="/venues/(\d+)"', html)]
+
+# walking the venues listing forwards and then back gives every venue once, in city order, with the same pages
+def testCursorsWalkTheWholeListing(db, client):
+    expected = list(db.session.execute(select(Venue.id).order_by(Venue.state, Venue.city, Venue.id)).scalars())
+    pages = []
+    path = '/venues?limit=7'
+    while path:
+        html = client.get(path).get_data(as_text = True)
+        pages.append(venueIds(html))
+        path, previous = pagerLinks(html)
+    assert [id for page in pages for id in page] == expected
+    assert all(len(page) == 7 for page in pages[:-1])
+
+    backwards = []
+    while previous:
+        html = client.get(previous).get_data(as_text = True)
+        backwards.append(venueIds(html))
+        next, previous = pagerLinks(html)
+    assert backwards == pages[-2::-1]
+
+# the shows are paged by start time, a datetime in the cursor
+def testShowCursorsCarryTheStartTime(app, db):
+    expected = db.session.execute(select(Show.start_time, Show.venue_id, Show.artist_id).order_by(Show.start_time, Show.id)).all()
+    shows = []
+    pageArgs = PageArgs(limit = 50)
+    with app.test_request_context():
+        while True:
+            page = getShowsPage(pageArgs)
+            shows += [(show['start_time'], show['venue_id'], show['artist_id']) for show in page.items]
+            if page.nextCursor is None:
+                break
+            pageArgs = PageArgs(after = decodeCursor(page.nextCursor, 2), limit = 50)
+    assert shows == [tuple(row) for row in expected]
+
+def testCursorsRoundTrip():
+    assert decodeCursor(encodeCursor(['NY', 'New York', 12]), 3) == ['NY', 'New York', 12]
+    assert decodeCursor(encodeCursor([1]), 2) is None
+    assert decodeCursor('not a cursor!', 1) is None
+
+def testBadCursorIsABadRequest(client):
+    assert client.get('/venues?after=x').status_code == 400
+    assert client.get('/artists?before=' + encodeCursor([1, 2])).status_code == 400
+    assert client.get('/shows?limit=0').status_code == 400
@@ -0,0 +1,81 @@
+import sqlite3
+from datetime import datetime, timezone
+import pytest
+from flask import g
+from sqlalchemy import select, update
+import replicas
+from models import Venue, Artist
+
+# a replica made as a copy of the test database (after the fixtures a test asks for before it), which the
+# writes to the primary then leave behind; the routing of replicas.py is turned on with it for the test
+@pytest.fixture
+def router(app, db, tmp_path, monkeypatch):
+    path = tmp_path / 'replica.db'
+    with db.engine.connect() as connection:
+        source = connection.connection.driver_connection
+        target = sqlite3.connect(path)
+        source.backup(target)
+        target.close()
+    config = dict(app.config, SQLALCHEMY_REPLICA_URIS = ['sqlite:///%s' % path])
+    router = replicas.ReplicaRouter(config)
+    monkeypatch.setattr(replicas, 'router', router)
+    yield router
+    for replica in router.replicas:
+        replica.engine.dispose()
+
+# the name of a venue as a read of the view at path sees it, with the cookies of a client; the request has
+# an app context (and g) of its own, as it would in the app
+def readName(app, db, path, venueId, cookies = None):
+    headers = {'Cookie': '; '.join('%s=%s' % cookie for cookie in (cookies or {}).items())}
+    with app.app_context(), app.test_request_context(path, headers = headers):
+        replicas.beforeRequest(app)
+        try:
+            return db.session.execute(select(Venue.name).where(Venue.id == venueId)).scalar()
+        finally:
+            db.session.close()
+
+def testReadsGoToTheReplica(app, db, venue, router):
+    db.session.execute(update(Venue).where(Venue.id == venue).values(name = 'On The Primary'))
+    db.session.commit()
+    assert readName(app, db, '/venues/%d' % venue, venue) == 'Fixture Venue'
+    # a view that is not marked as reading only stays on the primary
+    assert readName(app, db, '/venues/%d/edit' % venue, venue) == 'On The Primary'
+
+# the client that wrote is pinned to the primary by its cookie; any other client still reads from the replica
+def testOnlyTheWritingClientReadsFromThePrimary(app, db, venue, router):
+    with app.app_context(), app.test_request_context('/venues/%d/edit' % venue, method = 'POST'):
+        db.session.execute(update(Venue).where(Venue.id == venue).values(name = 'Just Written'))
+        db.session.commit()
+        response = replicas.afterRequest(app, app.response_class())
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith(replicas.COOKIE + '=')
+    assert 'Max-Age=%d' % router.window in cookie
+
+    assert readName(app, db, '/venues/%d' % venue, venue, {replicas.COOKIE: '1'}) == 'Just Written'
+    assert readName(app, db, '/venues/%d' % venue, venue) == 'Fixture Venue'
+
+def testReadsSetNoCookie(app, router):
+    with app.app_context(), app.test_request_context('/venues'):
+        replicas.beforeRequest(app)
+        assert g.readReplica is router.replicas[0]
+        assert 'Set-Cookie' not in replicas.afterRequest(app, app.response_class()).headers
+    # a write in a GET (a venue deleted in the background from one, say) pins the client all the same
+    with app.app_context(), app.test_request_context('/venues'):
+        g.wrote = True
+        assert 'Set-Cookie' in replicas.afterRequest(app, app.response_class()).headers
+
+def testUnhealthyReplicaIsSkipped(router):
+    router.replicas[0].healthy = False
+    assert router.pick() is None
+
+# a shows page cached from a replica that had not caught up is read past by the client that wrote, and replaced
+def testWritingClientReadsPastTheShowsCache(db, client, venue, artist, addShow):
+    assert client.get('/shows?limit=5').status_code == 200
+    db.session.execute(update(Artist).where(Artist.id == artist).values(name = 'Early Bird Artist'))
+    addShow(venue, artist, datetime(1990, 1, 1, tzinfo = timezone.utc))
+    assert 'Early Bird Artist' not in client.get('/shows?limit=5').get_data(as_text = True)
+
+    client.set_cookie('localhost', replicas.COOKIE, '1')
+    assert 'Early Bird Artist' in client.get('/shows?limit=5').get_data(as_text = True)
+    client.delete_cookie('localhost', replicas.COOKIE)
+    assert 'Early Bird Artist' in client.get('/shows?limit=5').get_data(as_text = True)
@@ -0,0 +1,23 @@
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm
+from validation import validateRecord, validateBatch
+from helpers import venueForm
+
+# a batch gives every record the errors it would get on its own, as the forms would
+def testBatchAgreesWithRecords():
+    records = [
+        {'name': 'A', 'city': 'Austin', 'state': 'TX', 'address': '1 Main', 'genres': ['Jazz'], 'phone': '512-555-0100', 'facebook_link': ''},
+        {'name': ' ', 'city': 'Austin', 'state': 'XX', 'address': '1 Main', 'genres': ['Jazz']},
+        {'name': 'B', 'city': 'Austin', 'state': 'TX', 'address': '1 Main', 'genres': ['Polka']},
+        {'name': 'C', 'city': 'Austin', 'state': 'TX', 'address': '1 Main', 'genres': ['Jazz'], 'phone': '5', 'facebook_link': 'not a link'},
+        {'name': 'D', 'city': 'Austin', 'state': 'TX', 'address': '1 Main', 'genres': ['Jazz'], 'phone': '5', 'facebook_link': 'not a link'}
+    ]
+    assert validateBatch('venues', records) == [validateRecord('venues', record) for record in records]
+    assert [sorted(errors) for errors in validateBatch('venues', records)] == [[], ['name', 'state'], ['genres'], ['facebook_link', 'phone'], ['facebook_link', 'phone']]
+
+# the forms and the records share their rules: what one lets in, so does the other
+def testFormAgreesWithRecords(app):
+    for values in (venueForm(), venueForm(phone = '5'), venueForm(state = 'XX'), venueForm(genres = ['Polka'])):
+        with app.test_request_context():
+            form = VenueForm(MultiDict([(name, item) for name, value in values.items() for item in (value if isinstance(value, list) else [value])]))
+            assert form.validate() == (validateRecord('venues', values) == {})
@@ -0,0 +1,73 @@
+import functools
+import re
+import validators
+from enums import Genre, States
+
+# compiled once for every form and record instead of on every validate() call
+PHONE = re.compile(r'^\([0-9]{3}\) *[0-9]{3}-[0-9]{4}$|^[0-9]{3}-[0-9]{3}-[0-9]{4}$|^[0-9]{3}.[0-9]{3}.[0-9]{4}$|^$')
+STATES = frozenset(name for name, value in States.choices())
+GENRES = frozenset(name for name, value in Genre.choices())
+
+# the fields each kind of record must have (DataRequired on the forms)
+REQUIRED = {
+    'venues': ('name', 'city', 'state', 'address'),
+    'artists': ('name', 'city', 'state')
+}
+
+def isValidPhone(number):
+    return PHONE.match(number or '') is not None
+
+# a facebook link counts as valid when it is a url or empty
+def isValidFacebookLink(facebookLink):
+    return not facebookLink or bool(validators.url(facebookLink))
+
+# the checks VenueForm and ArtistForm make on top of their field validators;
+# gives the error messages by field, empty when everything is valid
+def checkContactFields(phone, facebookLink, isValidLink = isValidFacebookLink):
+    errors = {}
+    if not isValidPhone(phone):
+        errors['phone'] = ['Invalid phone.']
+    if not isValidLink(facebookLink):
+        errors['facebook_link'] = ['Invalid facebook link.']
+    return errors
+
+# DataRequired: present and not just white space
+def isGiven(value):
+    return bool(value) and (not isinstance(value, str) or bool(value.strip()))
+
+def text(value):
+    return '' if value is None else str(value)
+
+# the field validators of the forms: the required fields, and the choices of state and genres
+def checkFields(kind, record):
+    errors = {}
+    for name in REQUIRED[kind]:
+        if not isGiven(record.get(name)):
+            errors[name] = ['This field is required.']
+    if 'state' not in errors and record['state'] not in STATES:
+        errors['state'] = ['Not a valid choice.']
+    genres = record.get('genres')
+    if not genres:
+        errors['genres'] = ['This field is required.']
+    elif not GENRES.issuperset(genres):
+        errors['genres'] = ['Not a valid choice.']
+    return errors
+
+# check a whole venue or artist record (a dict, with genres as a list) with the rules of its form;
+# gives the error messages by field, empty when the record is valid
+def validateRecord(kind, record, isValidLink = isValidFacebookLink):
+    errors = checkFields(kind, record)
+    # like the forms, the contact fields are only looked at once everything else is valid
+    if not errors:
+        errors = checkContactFields(text(record.get('phone')), text(record.get('facebook_link')), isValidLink)
+    return errors
+
+# check many records of one kind at once; gives a list with the errors of every record, in order.
+# The url check is by far the most expensive step, so every distinct facebook link is checked only once.
+def validateBatch(kind, records):
+    isValidLink = functools.lru_cache(maxsize = None)(isValidFacebookLink)
+    return [validateRecord(kind, record, isValidLink) for record in records]
+
+# all the messages of an errors dict in one list
+def messages(errors):
+    return [message for fieldMessages in errors.values() for message in fieldMessages]